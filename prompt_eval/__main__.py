@@ -1,24 +1,59 @@
+import argparse
 import asyncio
 from huggingface_hub import login
 import logging
 import os
-import sys
-from typing import Iterator
-from .dataset_loader import load_samples
-from .runner import EvalFunc, run_eval
+from typing import Iterable, Iterator
+from .client_pool import configure_client_pool
+from .dataset_loader import Sample, load_samples
+from .early_stopping import EarlyStopping
+from .grade_cache import configure_grade_cache
+from .grader import configure_grade_batching
+from .metrics import configure_metrics
+from .rate_limiter import configure_rate_limit
+from .response_cache import configure_response_cache
+from .tracing import configure_tracer
+from .runner import EvalFunc, run_eval, run_evals
 
 from .eval_list import EVAL_FUNCTIONS
 
 
-def selected_eval_funcs() -> Iterator[EvalFunc]:
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="prompt_eval")
+    parser.add_argument("eval_funcs", nargs="*", metavar="eval_func")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip samples already in the output files and append new results.",
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Interleave the samples of all eval functions in one in-flight window.",
+    )
+    parser.add_argument(
+        "--early-stop-precision",
+        type=float,
+        help="Stop once accuracy is known within +/- this much, e.g. 0.02.",
+    )
+    parser.add_argument(
+        "--early-stop-reference",
+        help="Stop once accuracy differs significantly from this results file.",
+    )
+    return parser.parse_args()
+
+
+def selected_eval_funcs(eval_func_names: Iterable[str]) -> Iterator[EvalFunc]:
     """Eval functions selected by the user."""
-    for eval_func_name in sys.argv[1:]:
+    for eval_func_name in eval_func_names:
         if eval_func_name not in EVAL_FUNCTIONS:
             raise ValueError(f"Unknown eval function: {eval_func_name}")
         yield EVAL_FUNCTIONS[eval_func_name]
 
 
 async def main() -> None:
+    args = _parse_args()
+
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -29,21 +64,109 @@ async def main() -> None:
     token = os.getenv("HUGGINGFACE_TOKEN")
     login(token=token)
 
-    samples = list(load_samples("openai/gsm8k", "main", split="train"))
-
     model = "gemini-1.5-flash"
-    batch_size = 10
+    concurrency = 10
     limit = None
+    sample_index_filename = "gsm8k_main_train.arrow"
+    channel_pool_size = 4
+    requests_per_minute = 1000
+    tokens_per_minute = 4_000_000
+    # Without a file, responses are still shared within the run, e.g. by eval
+    # functions that start with the same solve step.
+    response_cache_filename = os.getenv("PROMPT_EVAL_RESPONSE_CACHE", ":memory:")
+    response_cache_max_bytes = 1 << 30
+    response_cache_max_age_sec = 60 * 60 * 24 * 30
+    grade_cache_filename = os.getenv("PROMPT_EVAL_GRADE_CACHE", "grade_cache.db")
+    grade_batch_size = 8
+    grade_batch_max_wait_sec = 0.5
+    # Prometheus text, or JSON if the name ends in .json.
+    metrics_filename = os.getenv("PROMPT_EVAL_METRICS")
+    # A Chrome trace event file, for https://ui.perfetto.dev.
+    trace_filename = os.getenv("PROMPT_EVAL_TRACE")
+
+    await configure_client_pool(channel_pool_size=channel_pool_size).prewarm()
+    configure_rate_limit(
+        model,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
+    response_cache = configure_response_cache(
+        response_cache_filename,
+        max_bytes=response_cache_max_bytes,
+        max_age_sec=response_cache_max_age_sec,
+    )
+    grade_cache = configure_grade_cache(grade_cache_filename)
+    configure_grade_batching(
+        batch_size=grade_batch_size, max_wait_sec=grade_batch_max_wait_sec
+    )
+
+    metrics = configure_metrics(metrics_filename) if metrics_filename else None
+    tracer = configure_tracer(trace_filename) if trace_filename else None
+    flush_metrics = (
+        asyncio.create_task(metrics.flush_periodically()) if metrics else None
+    )
 
-    for eval_func in selected_eval_funcs():
-        await run_eval(
-            model=model,
-            eval_func=eval_func,
-            samples=samples,
-            output_filename=f"{eval_func.__name__}.json",
-            batch_size=batch_size,
+    early_stopping = (
+        EarlyStopping(
+            precision=args.early_stop_precision,
+            reference_filename=args.early_stop_reference,
+        )
+        if args.early_stop_precision or args.early_stop_reference
+        else None
+    )
+
+    def samples() -> Iterator[Sample]:
+        return load_samples(
+            "openai/gsm8k",
+            "main",
+            split="train",
             limit=limit,
+            index_filename=sample_index_filename,
+            # Early stopping needs a random order to judge by the first results.
+            shuffle_seed=early_stopping.seed if early_stopping else None,
         )
 
+    flush_response_cache = asyncio.create_task(response_cache.flush_periodically())
+    flush_grade_cache = asyncio.create_task(grade_cache.flush_periodically())
+    # Whatever was paid for is kept, even if the run is interrupted.
+    try:
+        eval_funcs = list(selected_eval_funcs(args.eval_funcs))
+        if args.concurrent:
+            await run_evals(
+                model=model,
+                outputs={
+                    eval_func: f"{eval_func.__name__}.json" for eval_func in eval_funcs
+                },
+                samples=samples(),
+                concurrency=concurrency,
+                resume=args.resume,
+                early_stopping=early_stopping,
+            )
+            response_cache.log_stats()
+            grade_cache.log_stats()
+        else:
+            for eval_func in eval_funcs:
+                await run_eval(
+                    model=model,
+                    eval_func=eval_func,
+                    samples=samples(),
+                    output_filename=f"{eval_func.__name__}.json",
+                    concurrency=concurrency,
+                    resume=args.resume,
+                    early_stopping=early_stopping,
+                )
+                response_cache.log_stats()
+                grade_cache.log_stats()
+    finally:
+        flush_response_cache.cancel()
+        response_cache.flush()
+        flush_grade_cache.cancel()
+        grade_cache.flush()
+        if metrics and flush_metrics:
+            flush_metrics.cancel()
+            metrics.flush()
+        if tracer:
+            tracer.write()
+
 
 asyncio.run(main())
@@ -0,0 +1,66 @@
+import numpy as np
+from typing import Iterable, Sequence
+
+
+MISSING = -1
+
+
+class GradeMatrix:
+    """Grades as an int8 matrix of samples by eval functions.
+
+    A sample that an eval function has no result for is `MISSING`.
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_ids: Sequence[str],
+        eval_funcs: Sequence[str],
+        grades: np.ndarray,
+    ) -> None:
+        self.sample_ids = list(sample_ids)
+        self.eval_funcs = list(eval_funcs)
+        self.grades = grades
+
+    @classmethod
+    def from_rows(
+        cls, eval_funcs: Sequence[str], rows: Iterable[tuple[str, str, int]]
+    ) -> "GradeMatrix":
+        """Builds the matrix from (sample id, eval function, grade) rows."""
+        columns = {eval_func: j for j, eval_func in enumerate(eval_funcs)}
+        rows_by_sample: dict[str, int] = {}
+        row_indices = []
+        column_indices = []
+        grades = []
+        for id, eval_func, grade in rows:
+            row_indices.append(rows_by_sample.setdefault(id, len(rows_by_sample)))
+            column_indices.append(columns[eval_func])
+            grades.append(grade)
+
+        matrix = np.full((len(rows_by_sample), len(eval_funcs)), MISSING, np.int8)
+        matrix[row_indices, column_indices] = grades
+        return cls(
+            sample_ids=list(rows_by_sample), eval_funcs=eval_funcs, grades=matrix
+        )
+
+    def column(self, eval_func: str) -> int:
+        return self.eval_funcs.index(eval_func)
+
+    def flip_counts(self, *, from_grade: int, to_grade: int) -> np.ndarray:
+        """Pairwise flip counts between eval functions.
+
+        Entry [i, j] is the number of samples graded `from_grade` by eval
+        function i and `to_grade` by eval function j.
+        """
+        from_mask = (self.grades == from_grade).astype(np.int32)
+        to_mask = (self.grades == to_grade).astype(np.int32)
+        return from_mask.T @ to_mask
+
+    def flipped_samples(
+        self, *, reference: str, eval_func: str, from_grade: int, to_grade: int
+    ) -> list[str]:
+        """Samples graded `from_grade` by `reference` and `to_grade` by `eval_func`."""
+        flipped = (self.grades[:, self.column(reference)] == from_grade) & (
+            self.grades[:, self.column(eval_func)] == to_grade
+        )
+        return [self.sample_ids[i] for i in np.flatnonzero(flipped)]
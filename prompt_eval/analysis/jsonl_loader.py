@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+from pydantic import BaseModel
+from typing import NamedTuple, TypeVar
+
+
+BYTES_PER_PROCESS = 64 << 20
+
+
+Row = TypeVar("Row", bound=BaseModel)
+
+
+class Span(NamedTuple):
+    offset: int
+    length: int
+
+
+def _load_range(
+    filename: str, row_type: type[Row], start: int, end: int
+) -> tuple[list[Row], list[Span], int]:
+    """Rows, line spans and the end of the complete lines in [start, end)."""
+    with open(filename, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    complete = data.rfind(b"\n") + 1
+
+    rows = []
+    spans = []
+    offset = start
+    for line in data[:complete].split(b"\n")[:-1]:
+        if line:
+            rows.append(row_type.model_validate_json(line))
+            spans.append(Span(offset, len(line)))
+        offset += len(line) + 1
+    return rows, spans, start + complete
+
+
+def _line_boundaries(filename: str, start: int, end: int, parts: int) -> list[int]:
+    """Offsets that split [start, end) into up to `parts` runs of whole lines."""
+    boundaries = [start]
+    with open(filename, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(boundaries[-1], start + (end - start) * i // parts))
+            f.readline()
+            if f.tell() >= end:
+                break
+            boundaries.append(f.tell())
+    boundaries.append(end)
+    return boundaries
+
+
+def load_rows(
+    filename: str,
+    row_type: type[Row],
+    *,
+    start: int = 0,
+    processes: int | None = None,
+) -> tuple[list[Row], list[Span], int]:
+    """Parses the fields of `row_type` from each complete line after `start`.
+
+    Returns the rows, the byte span of each row's line, and the offset just
+    past the last complete line. Lines are validated straight from bytes, so
+    fields outside `row_type`, such as the model transcripts, are skipped by
+    the parser without becoming Python objects. Files larger than
+    `BYTES_PER_PROCESS` are split into runs of lines parsed in parallel.
+    """
+    end = os.path.getsize(filename)
+    parts = min(
+        processes or os.cpu_count() or 1,
+        max(1, (end - start) // BYTES_PER_PROCESS),
+    )
+    boundaries = _line_boundaries(filename, start, end, parts)
+    if len(boundaries) == 2:
+        return _load_range(filename, row_type, start, end)
+
+    starts = boundaries[:-1]
+    with ProcessPoolExecutor(max_workers=len(starts)) as executor:
+        results = list(
+            executor.map(
+                _load_range,
+                [filename] * len(starts),
+                [row_type] * len(starts),
+                starts,
+                boundaries[1:],
+            )
+        )
+
+    rows = [row for range_rows, _, _ in results for row in range_rows]
+    spans = [span for _, range_spans, _ in results for span in range_spans]
+    return rows, spans, results[-1][2]
@@ -0,0 +1,140 @@
+import argparse
+from devtools import debug
+import time
+from typing import Any, Sequence
+from .grade_matrix import GradeMatrix
+from .results_store import ResultsStore
+from .stats import compare
+
+
+RESULTS_STORE_FILENAME = "results.db"
+FOLLOW_INTERVAL_SEC = 10
+
+
+def _short_name(eval_func: str) -> str:
+    return eval_func.removeprefix("eval_")
+
+
+def _accuracy(correct: int, incorrect: int) -> str:
+    total = correct + incorrect
+    return f"{correct / total:.2%}" if total else "n/a"
+
+
+def _ingest(store: ResultsStore, eval_funcs: Sequence[str]) -> int:
+    return sum(store.ingest(f"{eval_func}.json") for eval_func in eval_funcs)
+
+
+def _print_counts(store: ResultsStore, eval_funcs: Sequence[str]) -> None:
+    """Prints the running counts of `eval_funcs`, against the first of them."""
+    correct = store.grade_counts(eval_funcs, 1)
+    incorrect = store.grade_counts(eval_funcs, 0)
+    improvement = store.flip_counts(eval_funcs, from_grade=0, to_grade=1)
+    deterioration = store.flip_counts(eval_funcs, from_grade=1, to_grade=0)
+
+    for j, eval_func in enumerate(eval_funcs):
+        name = _short_name(eval_func)
+        stats: dict[str, Any] = {
+            f"{name}_correct": int(correct[j]),
+            f"{name}_incorrect": int(incorrect[j]),
+            f"{name}_accuracy": _accuracy(correct[j], incorrect[j]),
+        }
+        if j > 0:
+            stats[f"{name}_improvement"] = int(improvement[0, j])
+            stats[f"{name}_deterioration"] = int(deterioration[0, j])
+        debug(**stats)
+
+    names = [_short_name(eval_func) for eval_func in eval_funcs]
+    pairwise: dict[str, Any] = {
+        f"pairwise_{label}": {
+            from_name: {
+                to_name: int(flips[i, j]) for j, to_name in enumerate(names) if i != j
+            }
+            for i, from_name in enumerate(names)
+        }
+        for label, flips in (
+            ("improvement", improvement),
+            ("deterioration", deterioration),
+        )
+    }
+    debug(**pairwise)
+
+
+def report(*, reference: str, eval_funcs: Sequence[str]) -> None:
+    """Compares each of `eval_funcs` against `reference`, sample by sample."""
+    store = ResultsStore(RESULTS_STORE_FILENAME)
+    all_eval_funcs = [reference, *eval_funcs]
+    _ingest(store, all_eval_funcs)
+    _print_counts(store, all_eval_funcs)
+
+    matrix = GradeMatrix.from_rows(all_eval_funcs, store.grades(all_eval_funcs))
+    accuracy_intervals, paired_comparisons = compare(matrix)
+    debug(
+        accuracy_intervals=[
+            f"{_short_name(i.eval_func)}: {i.accuracy:.2%} [{i.low:.2%}, {i.high:.2%}]"
+            for i in accuracy_intervals
+        ],
+        paired_comparisons=[
+            f"{_short_name(c.eval_func)} - {_short_name(c.reference)}: "
+            f"{c.difference:+.2%} [{c.low:+.2%}, {c.high:+.2%}], "
+            f"McNemar p={c.mcnemar_p_value:.3g}"
+            for c in paired_comparisons
+        ],
+    )
+
+    for eval_func in eval_funcs:
+        name = _short_name(eval_func)
+        for label, from_grade, to_grade in (("better", 0, 1), ("worse", 1, 0)):
+            sample_ids = matrix.flipped_samples(
+                reference=reference,
+                eval_func=eval_func,
+                from_grade=from_grade,
+                to_grade=to_grade,
+            )
+            # Both files have a result for every flipped sample, so the two
+            # streams line up.
+            for (_, reference_experiment), (_, experiment) in zip(
+                store.experiments(f"{reference}.json", sample_ids),
+                store.experiments(f"{eval_func}.json", sample_ids),
+            ):
+                flipped_experiment: dict[str, Any] = {
+                    f"{label}_{name}": {
+                        reference: reference_experiment,
+                        eval_func: experiment,
+                    }
+                }
+                debug(**flipped_experiment)
+
+
+def follow(
+    *,
+    reference: str,
+    eval_funcs: Sequence[str],
+    interval_sec: float = FOLLOW_INTERVAL_SEC,
+) -> None:
+    """Prints the running counts each time the output files grow.
+
+    Each poll reads only the lines appended since the last one.
+    """
+    store = ResultsStore(RESULTS_STORE_FILENAME)
+    all_eval_funcs = [reference, *eval_funcs]
+    _print_counts(store, all_eval_funcs)
+    while True:
+        if _ingest(store, all_eval_funcs):
+            _print_counts(store, all_eval_funcs)
+        time.sleep(interval_sec)
+
+
+def run_report(*, reference: str, eval_funcs: Sequence[str]) -> None:
+    """Runs `report`, or `follow` with --follow, from the command line."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep printing counts as the eval output files grow.",
+    )
+    args = parser.parse_args()
+
+    if args.follow:
+        follow(reference=reference, eval_funcs=eval_funcs)
+    else:
+        report(reference=reference, eval_funcs=eval_funcs)
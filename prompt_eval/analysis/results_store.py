@@ -0,0 +1,266 @@
+from collections import Counter
+import hashlib
+import json
+import mmap
+import numpy as np
+import os
+from pydantic import BaseModel
+import sqlite3
+from typing import Any, BinaryIO, Iterable, Iterator, Sequence
+from ..dataset_loader import sample_id
+from .jsonl_loader import load_rows
+
+
+_SCHEMA_VERSION = 4
+_SCHEMA = """
+DROP TABLE IF EXISTS results;
+DROP TABLE IF EXISTS ingested_files;
+DROP TABLE IF EXISTS grade_counts;
+DROP TABLE IF EXISTS flip_counts;
+CREATE TABLE IF NOT EXISTS results (
+    sample_id TEXT NOT NULL,
+    eval_func TEXT NOT NULL,
+    question TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    graded_by TEXT NOT NULL,
+    line_offset INTEGER NOT NULL,
+    line_length INTEGER NOT NULL,
+    PRIMARY KEY (sample_id, eval_func)
+);
+CREATE INDEX IF NOT EXISTS results_eval_func_grade ON results (eval_func, grade);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    filename TEXT PRIMARY KEY,
+    first_line_hash TEXT NOT NULL,
+    last_line_offset INTEGER NOT NULL,
+    last_line_hash TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grade_counts (
+    eval_func TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (eval_func, grade)
+);
+CREATE TABLE IF NOT EXISTS flip_counts (
+    from_eval_func TEXT NOT NULL,
+    to_eval_func TEXT NOT NULL,
+    from_grade INTEGER NOT NULL,
+    to_grade INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (from_eval_func, to_eval_func, from_grade, to_grade)
+);
+"""
+
+
+class _ResultFields(BaseModel):
+    """The fields of an eval result that are indexed."""
+
+    question: str
+    grade: int
+    graded_by: str = "llm"
+
+
+def eval_func_name(output_filename: str) -> str:
+    """The eval function whose results are in `output_filename`."""
+    return os.path.splitext(os.path.basename(output_filename))[0]
+
+
+class ResultsStore:
+    """An SQLite index of the eval output files.
+
+    The store keeps the indexed fields of each result and the byte span of
+    its line in the output file. Full results are read back from the output
+    file only when asked for, so the store stays small however long the
+    model transcripts are.
+
+    Each output file is ingested incrementally: only the lines appended since
+    the last ingestion are read. A file that was rewritten from scratch, found
+    by a change in its first line or in the last line ingested, is ingested
+    again from the start. The store also keeps running grade and flip counts,
+    updated as rows are ingested, so summary counts cost nothing to read
+    however many results there are.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self._connection = sqlite3.connect(filename)
+        (version,) = self._connection.execute("PRAGMA user_version").fetchone()
+        if version != _SCHEMA_VERSION:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def ingest(self, output_filename: str) -> int:
+        """Reads new lines of `output_filename`. Returns the number of new rows."""
+        eval_func = eval_func_name(output_filename)
+        if not os.path.exists(output_filename):
+            # The results of a deleted file are no longer reported.
+            self._forget(eval_func)
+            self._connection.execute(
+                "DELETE FROM ingested_files WHERE filename = ?", (output_filename,)
+            )
+            self._connection.commit()
+            return 0
+
+        with open(output_filename, "rb") as f:
+            first_line_hash = hashlib.sha256(f.readline()).hexdigest()
+            offset, last_line_offset = self._ingested_offset(
+                output_filename, f, first_line_hash
+            )
+            if offset == 0:
+                self._forget(eval_func)
+
+        fields, spans, end = load_rows(output_filename, _ResultFields, start=offset)
+        if spans:
+            last_line_offset = spans[-1].offset
+        with open(output_filename, "rb") as f:
+            f.seek(last_line_offset)
+            last_line_hash = hashlib.sha256(f.read(end - last_line_offset)).hexdigest()
+        grade_counts: Counter[tuple[str, int]] = Counter()
+        flip_counts: Counter[tuple[str, str, int, int]] = Counter()
+        for field, span in zip(fields, spans):
+            id = sample_id(field.question)
+            other_grades = dict(
+                self._connection.execute(
+                    "SELECT eval_func, grade FROM results WHERE sample_id = ?", (id,)
+                ).fetchall()
+            )
+            # A result replaced by a later line of the same file stops counting.
+            old_grade = other_grades.pop(eval_func, None)
+            for grade, count in ((old_grade, -1), (field.grade, 1)):
+                if grade is None:
+                    continue
+                grade_counts[eval_func, grade] += count
+                for other_eval_func, other_grade in other_grades.items():
+                    flip_counts[other_eval_func, eval_func, other_grade, grade] += count
+                    flip_counts[eval_func, other_eval_func, grade, other_grade] += count
+
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    id,
+                    eval_func,
+                    field.question,
+                    field.grade,
+                    field.graded_by,
+                    span.offset,
+                    span.length,
+                ),
+            )
+
+        self._connection.executemany(
+            """INSERT INTO grade_counts VALUES (?, ?, ?)
+            ON CONFLICT DO UPDATE SET count = count + excluded.count""",
+            [(*key, count) for key, count in grade_counts.items()],
+        )
+        self._connection.executemany(
+            """INSERT INTO flip_counts VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT DO UPDATE SET count = count + excluded.count""",
+            [(*key, count) for key, count in flip_counts.items()],
+        )
+        self._connection.execute(
+            "INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?)",
+            (output_filename, first_line_hash, last_line_offset, last_line_hash, end),
+        )
+        self._connection.commit()
+        return len(fields)
+
+    def _forget(self, eval_func: str) -> None:
+        self._connection.execute(
+            "DELETE FROM results WHERE eval_func = ?", (eval_func,)
+        )
+        self._connection.execute(
+            "DELETE FROM grade_counts WHERE eval_func = ?", (eval_func,)
+        )
+        self._connection.execute(
+            "DELETE FROM flip_counts WHERE from_eval_func = ? OR to_eval_func = ?",
+            (eval_func, eval_func),
+        )
+
+    def _ingested_offset(
+        self, output_filename: str, f: BinaryIO, first_line_hash: str
+    ) -> tuple[int, int]:
+        """The offset to resume ingesting from, and where its last line starts.
+
+        Both are 0 if the file must be ingested from the start.
+        """
+        row = self._connection.execute(
+            """SELECT first_line_hash, last_line_offset, last_line_hash, offset
+            FROM ingested_files WHERE filename = ?""",
+            (output_filename,),
+        ).fetchone()
+        if row is None or row[0] != first_line_hash:
+            return 0, 0
+
+        _, last_line_offset, last_line_hash, offset = row
+        f.seek(last_line_offset)
+        last_line = f.read(offset - last_line_offset)
+        # A rewrite that starts with the same line still changes the bytes
+        # before the old offset, or moves it off a line boundary.
+        if (
+            not last_line.endswith(b"\n")
+            or hashlib.sha256(last_line).hexdigest() != last_line_hash
+        ):
+            return 0, 0
+        return offset, last_line_offset
+
+    def grades(self, eval_funcs: Sequence[str]) -> list[tuple[str, str, int]]:
+        """(sample id, eval function, grade) of every result of `eval_funcs`."""
+        return self._connection.execute(
+            f"""SELECT sample_id, eval_func, grade FROM results
+            WHERE eval_func IN ({", ".join("?" * len(eval_funcs))})""",
+            list(eval_funcs),
+        ).fetchall()
+
+    def grade_counts(self, eval_funcs: Sequence[str], grade: int) -> np.ndarray:
+        """The number of results of each of `eval_funcs` graded `grade`."""
+        counts = dict(
+            self._connection.execute(
+                "SELECT eval_func, count FROM grade_counts WHERE grade = ?", (grade,)
+            ).fetchall()
+        )
+        return np.array([counts.get(eval_func, 0) for eval_func in eval_funcs])
+
+    def flip_counts(
+        self, eval_funcs: Sequence[str], *, from_grade: int, to_grade: int
+    ) -> np.ndarray:
+        """Pairwise flip counts between eval functions, as in `GradeMatrix`.
+
+        Entry [i, j] is the number of samples graded `from_grade` by
+        `eval_funcs[i]` and `to_grade` by `eval_funcs[j]`.
+        """
+        columns = {eval_func: j for j, eval_func in enumerate(eval_funcs)}
+        counts = np.zeros((len(eval_funcs), len(eval_funcs)), dtype=np.int64)
+        for from_eval_func, to_eval_func, count in self._connection.execute(
+            """SELECT from_eval_func, to_eval_func, count FROM flip_counts
+            WHERE from_grade = ? AND to_grade = ?""",
+            (from_grade, to_grade),
+        ):
+            if from_eval_func in columns and to_eval_func in columns:
+                counts[columns[from_eval_func], columns[to_eval_func]] = count
+        return counts
+
+    def experiments(
+        self, output_filename: str, sample_ids: Iterable[str]
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """The full results in `output_filename` for `sample_ids`, one at a time.
+
+        Each result is parsed from a memory map of the output file when it is
+        reached, so only one is held in memory at a time. Sample ids without a
+        result are skipped. `output_filename` must have been ingested since it
+        was last rewritten.
+        """
+        if not os.path.exists(output_filename) or not os.path.getsize(output_filename):
+            return
+
+        eval_func = eval_func_name(output_filename)
+        with open(output_filename, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as lines:
+            for id in sample_ids:
+                row = self._connection.execute(
+                    """SELECT line_offset, line_length FROM results
+                    WHERE sample_id = ? AND eval_func = ?""",
+                    (id, eval_func),
+                ).fetchone()
+                if row:
+                    offset, length = row
+                    yield id, json.loads(lines[offset : offset + length])
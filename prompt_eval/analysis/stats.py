@@ -0,0 +1,154 @@
+import itertools
+import math
+import numpy as np
+from pydantic import BaseModel
+from .grade_matrix import GradeMatrix
+
+
+RESAMPLES = 10_000
+CONFIDENCE = 0.95
+
+
+class AccuracyInterval(BaseModel, frozen=True):
+    eval_func: str
+    accuracy: float
+    low: float
+    high: float
+
+
+class PairedComparison(BaseModel, frozen=True):
+    """`eval_func` minus `reference` in accuracy, on samples graded by both."""
+
+    reference: str
+    eval_func: str
+    difference: float
+    low: float
+    high: float
+    mcnemar_p_value: float
+
+
+def mcnemar_p_value(improvement: int, deterioration: int) -> float:
+    """The exact two-sided McNemar test on the discordant pair counts."""
+    n = improvement + deterioration
+    if n == 0:
+        return 1.0
+    k = min(improvement, deterioration)
+    log_half = n * math.log(0.5)
+    tail = sum(
+        math.exp(
+            math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1) + log_half
+        )
+        for i in range(k + 1)
+    )
+    return min(1.0, 2 * tail)
+
+
+def _resample_counts(
+    row_counts: np.ndarray, *, resamples: int, rng: np.random.Generator
+) -> np.ndarray:
+    """How often each group of rows is drawn in each resample.
+
+    This is a multinomial draw, done as one binomial per group across all
+    resamples at once.
+    """
+    counts = np.empty((resamples, len(row_counts)), dtype=np.int64)
+    remaining = np.full(resamples, row_counts.sum())
+    rows_left = row_counts.sum()
+    for group, row_count in enumerate(row_counts[:-1]):
+        counts[:, group] = rng.binomial(remaining, row_count / rows_left)
+        remaining -= counts[:, group]
+        rows_left -= row_count
+    counts[:, -1] = remaining
+    return counts
+
+
+def bootstrap_ratios(
+    numerators: np.ndarray,
+    denominators: np.ndarray,
+    *,
+    resamples: int = RESAMPLES,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Bootstrap replicates of column sum ratios, as a resamples-by-columns array.
+
+    All columns share the same resampled rows, which keeps paired columns
+    paired. Identical rows are pooled, and the number of draws from each pool
+    is sampled directly. That has the same distribution as resampling row
+    indices, without a resamples-by-rows index array.
+    """
+    columns = numerators.shape[1]
+    unique_rows, row_counts = np.unique(
+        np.column_stack([numerators, denominators]), axis=0, return_counts=True
+    )
+    counts = _resample_counts(row_counts, resamples=resamples, rng=rng).astype(
+        np.float64
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (counts @ unique_rows[:, :columns]) / (counts @ unique_rows[:, columns:])
+
+
+def compare(
+    matrix: GradeMatrix,
+    *,
+    resamples: int = RESAMPLES,
+    confidence: float = CONFIDENCE,
+    seed: int = 0,
+) -> tuple[list[AccuracyInterval], list[PairedComparison]]:
+    """Bootstrap intervals for each accuracy and for each pairwise difference.
+
+    Pairwise differences also get an exact McNemar p-value.
+    """
+    if matrix.grades.shape[0] == 0:
+        return [], []
+
+    graded = matrix.grades >= 0
+    correct = matrix.grades == 1
+    pairs = list(itertools.combinations(range(len(matrix.eval_funcs)), 2))
+
+    numerators = [correct[:, j] for j in range(len(matrix.eval_funcs))]
+    denominators = [graded[:, j] for j in range(len(matrix.eval_funcs))]
+    for i, j in pairs:
+        both = graded[:, i] & graded[:, j]
+        numerators.append(
+            both * (correct[:, j].astype(np.int8) - correct[:, i].astype(np.int8))
+        )
+        denominators.append(both)
+
+    numerator_matrix = np.column_stack(numerators)
+    denominator_matrix = np.column_stack(denominators)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        estimates = numerator_matrix.sum(axis=0) / denominator_matrix.sum(axis=0)
+    replicates = bootstrap_ratios(
+        numerator_matrix,
+        denominator_matrix,
+        resamples=resamples,
+        rng=np.random.default_rng(seed),
+    )
+    alpha = 1 - confidence
+    lows, highs = np.nanquantile(replicates, [alpha / 2, 1 - alpha / 2], axis=0)
+
+    intervals = [
+        AccuracyInterval(
+            eval_func=eval_func,
+            accuracy=estimates[j],
+            low=lows[j],
+            high=highs[j],
+        )
+        for j, eval_func in enumerate(matrix.eval_funcs)
+    ]
+    improvement = matrix.flip_counts(from_grade=0, to_grade=1)
+    comparisons = [
+        PairedComparison(
+            reference=matrix.eval_funcs[i],
+            eval_func=matrix.eval_funcs[j],
+            difference=estimates[k],
+            low=lows[k],
+            high=highs[k],
+            mcnemar_p_value=mcnemar_p_value(
+                int(improvement[i, j]), int(improvement[j, i])
+            ),
+        )
+        for k, (i, j) in enumerate(pairs, start=len(matrix.eval_funcs))
+    ]
+    return intervals, comparisons
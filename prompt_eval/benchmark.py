@@ -0,0 +1,173 @@
+"""Measures the runner against the local model, without spending quota.
+
+    python -m prompt_eval.benchmark [eval_func ...] [--samples N] ...
+
+Each eval function is run over the same synthetic samples, and its samples
+per second, sample latency percentiles and CPU time per model call are
+printed. The local model only sleeps, so CPU time is the runner's own
+overhead.
+"""
+
+import argparse
+import asyncio
+from devtools import debug
+import functools
+import logging
+import numpy as np
+import os
+from pydantic import BaseModel
+import tempfile
+import time
+from typing import Any
+from .client_pool import configure_client_pool
+from .dataset_loader import Sample
+from .eval_list import EVAL_FUNCTIONS, EvalFunc
+from .local_model import LocalBehavior, LocalGenerativeModel
+from .runner import run_eval
+from .tracing import configure_tracer
+
+
+MODEL = "gemini-1.5-flash"
+
+
+class BenchmarkResult(BaseModel, frozen=True):
+    eval_func: str
+    samples: int
+    errors: int
+    calls: int
+    wall_sec: float
+    samples_per_sec: float
+    p50_latency_sec: float
+    p99_latency_sec: float
+    cpu_ms_per_call: float
+
+
+def synthetic_samples(count: int) -> list[Sample]:
+    """Questions whose answers the local model sometimes guesses."""
+    return [
+        Sample(
+            question=f"What is the last digit of {i}?",
+            answer=f"The last digit of {i} is {i % 10}.\n#### {i % 10}",
+        )
+        for i in range(count)
+    ]
+
+
+async def benchmark_eval(
+    eval_func: EvalFunc,
+    *,
+    samples: list[Sample],
+    behavior: LocalBehavior,
+    concurrency: int,
+    output_dir: str,
+) -> BenchmarkResult:
+    models: list[LocalGenerativeModel] = []
+
+    def model_factory(model: str, *, system_instruction: str) -> Any:
+        m = LocalGenerativeModel(
+            model, system_instruction=system_instruction, behavior=behavior
+        )
+        models.append(m)
+        return m
+
+    configure_client_pool(channel_pool_size=1, model_factory=model_factory)
+
+    latencies = []
+    errors = 0
+
+    @functools.wraps(eval_func)
+    async def timed_eval_func(model: str, sample: Sample) -> BaseModel:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            return await eval_func(model, sample)
+        except Exception:
+            errors += 1
+            raise
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    await run_eval(
+        model=MODEL,
+        eval_func=timed_eval_func,
+        samples=samples,
+        output_filename=os.path.join(output_dir, f"{eval_func.__name__}.json"),
+        concurrency=concurrency,
+    )
+    cpu_sec = time.process_time() - cpu_start
+    wall_sec = time.perf_counter() - wall_start
+
+    calls = sum(m.calls for m in models)
+    p50, p99 = np.percentile(latencies, [50, 99]) if latencies else (0.0, 0.0)
+    return BenchmarkResult(
+        eval_func=eval_func.__name__,
+        samples=len(latencies),
+        errors=errors,
+        calls=calls,
+        wall_sec=wall_sec,
+        samples_per_sec=len(latencies) / wall_sec,
+        p50_latency_sec=p50,
+        p99_latency_sec=p99,
+        cpu_ms_per_call=1000 * cpu_sec / max(1, calls),
+    )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="prompt_eval.benchmark")
+    parser.add_argument(
+        "eval_funcs", nargs="*", metavar="eval_func", default=list(EVAL_FUNCTIONS)
+    )
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--median-latency-sec", type=float, default=0.2)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--sec-per-output-token", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int)
+    parser.add_argument("--resource-exhausted-rate", type=float, default=0.0)
+    parser.add_argument("--internal-server-error-rate", type=float, default=0.0)
+    parser.add_argument("--deadline-exceeded-rate", type=float, default=0.0)
+    parser.add_argument("--trace", help="Write a Chrome trace event file.")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = _parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        filename="benchmark.log",
+        filemode="w",
+    )
+
+    behavior = LocalBehavior(
+        median_latency_sec=args.median_latency_sec,
+        latency_sigma=args.latency_sigma,
+        sec_per_output_token=args.sec_per_output_token,
+        output_tokens=args.output_tokens,
+        resource_exhausted_rate=args.resource_exhausted_rate,
+        internal_server_error_rate=args.internal_server_error_rate,
+        deadline_exceeded_rate=args.deadline_exceeded_rate,
+    )
+    tracer = configure_tracer(args.trace) if args.trace else None
+    samples = synthetic_samples(args.samples)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for eval_func_name in args.eval_funcs:
+            if eval_func_name not in EVAL_FUNCTIONS:
+                raise ValueError(f"Unknown eval function: {eval_func_name}")
+            result = await benchmark_eval(
+                EVAL_FUNCTIONS[eval_func_name],
+                samples=samples,
+                behavior=behavior,
+                concurrency=args.concurrency,
+                output_dir=output_dir,
+            )
+            debug(result)
+    if tracer:
+        tracer.write()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
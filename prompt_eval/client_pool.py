@@ -0,0 +1,92 @@
+import asyncio
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+import itertools
+from typing import Any, Callable, Iterator
+
+
+PREWARM_TIMEOUT_SEC = 30
+
+
+class ClientPool:
+    """Reuses GenerativeModel objects and spreads them over a few channels.
+
+    There is one model object per (model, system instruction, channel). Calls
+    with the same model and system instruction rotate over the channels.
+
+    A `model_factory` replaces GenerativeModel with a local stand-in, which
+    has no channels.
+
+    Channels are made with private parts of google-generativeai, so its
+    version is pinned exactly in pyproject.toml.
+    """
+
+    def __init__(
+        self,
+        *,
+        channel_pool_size: int,
+        model_factory: Callable[..., Any] | None = None,
+    ) -> None:
+        self._channel_pool_size = channel_pool_size
+        self._model_factory = model_factory
+        self._channels: list[Any] = []
+        self._models: dict[tuple[str, str], list[Any]] = {}
+        self._next: dict[tuple[str, str], Iterator[Any]] = {}
+
+    def _get_channels(self) -> list[Any]:
+        if not self._channels and not self._model_factory:
+            self._channels = [
+                genai_client._client_manager.make_client("generative_async")
+                for _ in range(self._channel_pool_size)
+            ]
+        return self._channels
+
+    def get_model(self, model: str, system_instruction: str) -> Any:
+        key = (model, system_instruction)
+        if key not in self._models and self._model_factory:
+            self._models[key] = [
+                self._model_factory(model, system_instruction=system_instruction)
+            ]
+            self._next[key] = itertools.cycle(self._models[key])
+        if key not in self._models:
+            models = []
+            for channel in self._get_channels():
+                m = genai.GenerativeModel(model, system_instruction=system_instruction)
+                # GenerativeModel otherwise binds to the library's single
+                # default client on first use.
+                m._async_client = channel
+                models.append(m)
+            self._models[key] = models
+            self._next[key] = itertools.cycle(models)
+        return next(self._next[key])
+
+    async def prewarm(self) -> None:
+        """Connects every channel ahead of the first call."""
+        await asyncio.wait_for(
+            asyncio.gather(
+                *[
+                    channel.transport.grpc_channel.channel_ready()
+                    for channel in self._get_channels()
+                ]
+            ),
+            timeout=PREWARM_TIMEOUT_SEC,
+        )
+
+
+_client_pool = ClientPool(channel_pool_size=1)
+
+
+def configure_client_pool(
+    *,
+    channel_pool_size: int,
+    model_factory: Callable[..., Any] | None = None,
+) -> ClientPool:
+    global _client_pool
+    _client_pool = ClientPool(
+        channel_pool_size=channel_pool_size, model_factory=model_factory
+    )
+    return _client_pool
+
+
+def get_client_pool() -> ClientPool:
+    return _client_pool
@@ -1,13 +1,99 @@
 from datasets import load_dataset
-import math
+import hashlib
+import itertools
+import numpy as np
+import os
+import pyarrow as pa
 from pydantic import BaseModel
-from typing import Iterator
+from typing import Iterable, Iterator
+
+
+BATCH_SIZE = 1000
+
+
+def sample_id(question: str) -> str:
+    """A stable id for a question, the same across runs and dataset versions."""
+    return hashlib.sha256(question.encode()).hexdigest()[:16]
 
 
 class Sample(BaseModel, frozen=True):
     question: str
     answer: str
 
+    @property
+    def id(self) -> str:
+        return sample_id(self.question)
+
+
+_SAMPLE_INDEX_SCHEMA = pa.schema(
+    [("id", pa.string()), ("question", pa.string()), ("answer", pa.string())]
+)
+
+
+class SampleIndex:
+    """Question/answer pairs with their ids, in a memory-mapped Arrow file."""
+
+    def __init__(self, filename: str) -> None:
+        self._table = pa.ipc.open_file(pa.memory_map(filename)).read_all()
+
+    @staticmethod
+    def build(filename: str, rows: Iterable[dict[str, list[str]]]) -> None:
+        """Writes an index from batches of `question` and `answer` columns.
+
+        The file is written under a temporary name and moved into place, so an
+        interrupted build never leaves a truncated index behind.
+        """
+        temporary_filename = f"{filename}.tmp"
+        with pa.OSFile(temporary_filename, "wb") as sink:
+            with pa.ipc.new_file(sink, _SAMPLE_INDEX_SCHEMA) as writer:
+                for batch in rows:
+                    writer.write_batch(
+                        pa.record_batch(
+                            [
+                                [sample_id(q) for q in batch["question"]],
+                                batch["question"],
+                                batch["answer"],
+                            ],
+                            schema=_SAMPLE_INDEX_SCHEMA,
+                        )
+                    )
+        os.replace(temporary_filename, filename)
+
+    def __len__(self) -> int:
+        return self._table.num_rows
+
+    def iter_samples(
+        self,
+        *,
+        offset: int = 0,
+        limit: int | None = None,
+        shuffle_seed: int | None = None,
+    ) -> Iterator[Sample]:
+        """Up to `limit` samples from `offset` on, shuffled with `shuffle_seed`.
+
+        Only the row indices are shuffled. Rows are still read a batch at a
+        time from the memory map.
+        """
+        if shuffle_seed is None:
+            batches = self._table.slice(offset, limit).to_batches(
+                max_chunksize=BATCH_SIZE
+            )
+        else:
+            stop = len(self) if limit is None else min(len(self), offset + limit)
+            indices = np.random.default_rng(shuffle_seed).permutation(
+                np.arange(offset, stop)
+            )
+            batches = (
+                self._table.take(indices[i : i + BATCH_SIZE])
+                for i in range(0, len(indices), BATCH_SIZE)
+            )
+        for batch in batches:
+            for question, answer in zip(
+                batch.column("question").to_pylist(),
+                batch.column("answer").to_pylist(),
+            ):
+                yield Sample(question=question, answer=answer)
+
 
 def load_samples(
     path: str,
@@ -15,7 +101,53 @@ def load_samples(
     *,
     split: str,
     limit: int | None = None,
+    offset: int = 0,
+    num_shards: int = 1,
+    shard_index: int = 0,
+    index_filename: str | None = None,
+    shuffle_seed: int | None = None,
 ) -> Iterator[Sample]:
+    """Streams samples, reading no further than `offset + limit`.
+
+    With `num_shards`, only the `shard_index`-th contiguous shard is read. With
+    `index_filename`, samples come from a local Arrow index, which is built
+    from the dataset on first use. With `shuffle_seed`, the samples after
+    `offset` are shuffled before `limit` is applied.
+    """
+    if index_filename:
+        if not os.path.exists(index_filename):
+            ds = load_dataset(path, name, split=split)
+            SampleIndex.build(index_filename, ds.iter(batch_size=BATCH_SIZE))
+        index = SampleIndex(index_filename)
+        shard_offset, shard_size = _shard_bounds(len(index), num_shards, shard_index)
+        samples = index.iter_samples(
+            offset=shard_offset + offset,
+            limit=_clip_limit(
+                shard_size - offset, limit if shuffle_seed is None else None
+            ),
+            shuffle_seed=shuffle_seed,
+        )
+        yield from itertools.islice(samples, limit)
+        return
+
     ds = load_dataset(path, name, split=split)
-    for row in [row for i, row in enumerate(ds) if i < (limit or math.inf)]:
-        yield Sample(question=row["question"], answer=row["answer"])
+    if num_shards > 1:
+        ds = ds.shard(num_shards, shard_index, contiguous=True)
+    if shuffle_seed is not None:
+        ds = ds.select(range(min(offset, len(ds)), len(ds))).shuffle(seed=shuffle_seed)
+        offset = 0
+    rows = ds.select(range(offset, offset + _clip_limit(len(ds) - offset, limit)))
+    for batch in rows.iter(batch_size=BATCH_SIZE):
+        for question, answer in zip(batch["question"], batch["answer"]):
+            yield Sample(question=question, answer=answer)
+
+
+def _shard_bounds(size: int, num_shards: int, shard_index: int) -> tuple[int, int]:
+    """Offset and size of a contiguous shard, split like `Dataset.shard`."""
+    div, mod = divmod(size, num_shards)
+    start = div * shard_index + min(shard_index, mod)
+    return start, div + (1 if shard_index < mod else 0)
+
+
+def _clip_limit(available: int, limit: int | None) -> int:
+    return max(0, available if limit is None else min(available, limit))
@@ -7,6 +7,7 @@ from google.api_core.exceptions import (
     ResourceExhausted,
 )
 import logging
+import random
 from typing import (
     Any,
     Awaitable,
@@ -14,6 +15,9 @@ from typing import (
     ParamSpec,
     TypeVar,
 )
+from .metrics import get_metrics, stage_labels
+from .rate_limiter import RetryBudget
+from .tracing import trace_span
 
 
 P = ParamSpec("P")
@@ -23,6 +27,29 @@ F = Callable[P, Awaitable[R]]
 
 MAX_SEC_TO_WAIT_ON_RESOURCE_EXHAUSTED = 60 * 5
 MAX_INTERNAL_SERVER_ERRORS = 10
+MIN_SEC_TO_WAIT_ON_RETRY = 1
+RETRY_BUDGET = 100
+RETRY_BUDGET_REFUND_PER_SUCCESS = 0.1
+RETRY_BUDGET_REFILL_PER_SEC = 1
+
+
+_retry_budget = RetryBudget(
+    max_retries=RETRY_BUDGET,
+    refund=RETRY_BUDGET_REFUND_PER_SUCCESS,
+    per_second=RETRY_BUDGET_REFILL_PER_SEC,
+)
+
+
+def _decorrelated_jitter(previous_wait_time: float, *, cap: float) -> float:
+    return min(cap, random.uniform(MIN_SEC_TO_WAIT_ON_RETRY, previous_wait_time * 3))
+
+
+def _record_retry(exception: Exception, wait_time: float) -> None:
+    metrics = get_metrics()
+    if metrics:
+        labels = stage_labels() | {"exception": type(exception).__name__}
+        metrics.inc("prompt_eval_retries_total", **labels)
+        metrics.inc("prompt_eval_backoff_seconds_total", wait_time, **labels)
 
 
 def limit_concurrency(*, concurrency: int):
@@ -42,11 +69,21 @@ def limit_concurrency(*, concurrency: int):
 def retry_on_resource_exhausted(func: F) -> F:
     @functools.wraps(func)
     async def wrapper(*args: Any, **kwargs: Any) -> Any:
-        wait_time = 1
+        wait_time: float = MIN_SEC_TO_WAIT_ON_RETRY
         while True:
             try:
-                return await func(*args, **kwargs)
+                result = await func(*args, **kwargs)
+                _retry_budget.refund()
+                return result
             except ResourceExhausted as e:
+                # Quota errors are never fatal: the rate limiter already paces
+                # requests, so an empty budget only delays the retry.
+                with trace_span("retry_budget", "retry"):
+                    await _retry_budget.spend()
+
+                wait_time = _decorrelated_jitter(
+                    wait_time, cap=MAX_SEC_TO_WAIT_ON_RESOURCE_EXHAUSTED
+                )
                 logging.warning(
                     debug.format(
                         "Resource exhausted",
@@ -54,9 +91,9 @@ def retry_on_resource_exhausted(func: F) -> F:
                         wait_time_to_retry=wait_time,
                     )
                 )
-                await asyncio.sleep(wait_time)
-                if wait_time < MAX_SEC_TO_WAIT_ON_RESOURCE_EXHAUSTED:
-                    wait_time *= 2
+                _record_retry(e, wait_time)
+                with trace_span("backoff", "retry", exception=type(e).__name__):
+                    await asyncio.sleep(wait_time)
 
     return wrapper
 
@@ -64,7 +101,7 @@ def retry_on_resource_exhausted(func: F) -> F:
 def retry_on_internal_server_error(func: F) -> F:
     @functools.wraps(func)
     async def wrapper(*args: Any, **kwargs: Any) -> Any:
-        wait_time = 1
+        wait_time: float = MIN_SEC_TO_WAIT_ON_RETRY
         try_count = 1
         while True:
             try:
@@ -72,7 +109,12 @@ def retry_on_internal_server_error(func: F) -> F:
             except (DeadlineExceeded, InternalServerError) as e:
                 if try_count >= MAX_INTERNAL_SERVER_ERRORS:
                     raise
+                if not _retry_budget.try_spend():
+                    raise
 
+                wait_time = _decorrelated_jitter(
+                    wait_time, cap=MAX_SEC_TO_WAIT_ON_RESOURCE_EXHAUSTED
+                )
                 logging.warning(
                     debug.format(
                         "Internal Server Error",
@@ -80,8 +122,9 @@ def retry_on_internal_server_error(func: F) -> F:
                         wait_time_to_retry=wait_time,
                     )
                 )
-                await asyncio.sleep(wait_time)
-                wait_time *= 2
+                _record_retry(e, wait_time)
+                with trace_span("backoff", "retry", exception=type(e).__name__):
+                    await asyncio.sleep(wait_time)
                 try_count += 1
 
     return wrapper
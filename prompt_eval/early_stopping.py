@@ -0,0 +1,119 @@
+import math
+import os
+from pydantic import BaseModel
+from statistics import NormalDist
+from .analysis.jsonl_loader import load_rows
+
+
+class EarlyStopping(BaseModel, frozen=True):
+    """When to stop evaluating samples before running out of them.
+
+    Without `reference_filename`, evaluation stops once the Wilson confidence
+    interval on accuracy is within +/- `precision`. With it, evaluation also
+    stops once the paired accuracy difference against the reference results
+    is significant at `alpha`.
+
+    The criteria are checked after `min_samples` results and then each time
+    the number of results doubles. Each check spends half of the remaining
+    `alpha`, so repeated checks do not inflate the error rate.
+    """
+
+    precision: float | None = None
+    reference_filename: str | None = None
+    alpha: float = 0.05
+    min_samples: int = 100
+    seed: int = 0
+
+
+class _GradeFields(BaseModel):
+    question: str
+    grade: int
+
+
+def load_grades(output_filename: str) -> dict[str, int]:
+    """The grade of each question in a results file, ignoring a partial last line."""
+    if not os.path.exists(output_filename):
+        return {}
+
+    rows, _, _ = load_rows(output_filename, _GradeFields)
+    return {row.question: row.grade for row in rows}
+
+
+def _half_width(values: list[int], alpha: float) -> float:
+    n = len(values)
+    mean = sum(values) / n
+    variance = sum((value - mean) ** 2 for value in values) / max(1, n - 1)
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    return z * math.sqrt(variance / n)
+
+
+def _wilson_interval(successes: int, n: int, alpha: float) -> tuple[float, float]:
+    """The Wilson score interval, which stays wide when all grades agree."""
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    p = successes / n
+    center = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half_width = z / (1 + z**2 / n) * math.sqrt(p * (1 - p) / n + z**2 / (4 * n**2))
+    return center - half_width, center + half_width
+
+
+class SequentialMonitor:
+    """Tracks the results of one eval function and decides when to stop."""
+
+    def __init__(self, early_stopping: EarlyStopping) -> None:
+        self._early_stopping = early_stopping
+        self._reference_grades = (
+            load_grades(early_stopping.reference_filename)
+            if early_stopping.reference_filename
+            else {}
+        )
+        self._grades: list[int] = []
+        self._differences: list[int] = []
+        self._requests: list[int] = []
+        self._next_check = early_stopping.min_samples
+        self._alpha = early_stopping.alpha
+        self.stopped = False
+        self.reason = ""
+
+    def record(self, question: str, grade: int, requests: int | None = None) -> None:
+        """Adds a result. `requests` is None for results from an earlier run."""
+        self._grades.append(grade)
+        if question in self._reference_grades:
+            self._differences.append(grade - self._reference_grades[question])
+        if requests is not None:
+            self._requests.append(requests)
+
+        if not self.stopped and len(self._grades) >= self._next_check:
+            self._next_check *= 2
+            self._alpha /= 2
+            self._check()
+
+    def _check(self) -> None:
+        precision = self._early_stopping.precision
+        accuracy = sum(self._grades) / len(self._grades)
+        low, high = _wilson_interval(sum(self._grades), len(self._grades), self._alpha)
+        if precision is not None and (high - low) / 2 <= precision:
+            self.stopped = True
+            self.reason = (
+                f"accuracy {accuracy:.2%} ({low:.2%} to {high:.2%}) "
+                f"after {len(self._grades)} samples"
+            )
+            return
+
+        if len(self._differences) < 2:
+            return
+        difference = sum(self._differences) / len(self._differences)
+        difference_half_width = _half_width(self._differences, self._alpha)
+        if abs(difference) > difference_half_width:
+            self.stopped = True
+            self.reason = (
+                f"accuracy difference {difference:+.2%} +/- "
+                f"{difference_half_width:.2%} against "
+                f"{self._early_stopping.reference_filename} "
+                f"after {len(self._differences)} paired samples"
+            )
+
+    def requests_saved(self, skipped_samples: int) -> int:
+        """An estimate of the requests not sent for `skipped_samples`."""
+        if not self._requests:
+            return 0
+        return round(skipped_samples * sum(self._requests) / len(self._requests))
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from .dataset_loader import Sample
 from .gemini import generate_content
-from .grader import grade_answers
+from .grader import GradedBy, grade_answers
 
 
 SOLVE_PROMPT = """Solve the given word problem.
@@ -47,6 +47,7 @@ class Experiment(BaseModel, frozen=True):
     human_answer: str
     llm_answer: str
     grade: int
+    graded_by: GradedBy = "llm"
 
 
 async def eval_1_prompt_consistency(
@@ -66,5 +67,6 @@ async def eval_1_prompt_consistency(
         question=sample.question,
         human_answer=sample.answer,
         llm_answer=model_answer,
-        grade=grade,
+        grade=grade.grade,
+        graded_by=grade.graded_by,
     )
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from .dataset_loader import Sample
 from .gemini import generate_content
-from .grader import grade_answers
+from .grader import GradedBy, grade_answers
 
 
 SOLVE_PROMPT = """You are a team of three word-problem solvers: Alice, Bob and Carol.
@@ -52,6 +52,7 @@ class Experiment(BaseModel, frozen=True):
     human_answer: str
     llm_answer: str
     grade: int
+    graded_by: GradedBy = "llm"
 
 
 async def eval_3_solvers_consistency(
@@ -71,5 +72,6 @@ async def eval_3_solvers_consistency(
         question=sample.question,
         human_answer=sample.answer,
         llm_answer=model_answer,
-        grade=grade,
+        grade=grade.grade,
+        graded_by=grade.graded_by,
     )
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from .dataset_loader import Sample
 from .gemini import generate_content
-from .grader import grade_answers
+from .grader import GradedBy, grade_answers
 
 
 SOLVE_PROMPT = """Solve the given word problem. Respond in the following format:
@@ -29,6 +29,7 @@ class Experiment(BaseModel, frozen=True):
     human_answer: str
     llm_answer: str
     grade: int
+    graded_by: GradedBy = "llm"
 
 
 async def eval_baseline(model: str, sample: Sample) -> Experiment:
@@ -45,5 +46,6 @@ async def eval_baseline(model: str, sample: Sample) -> Experiment:
         question=sample.question,
         human_answer=sample.answer,
         llm_answer=model_answer,
-        grade=grade,
+        grade=grade.grade,
+        graded_by=grade.graded_by,
     )
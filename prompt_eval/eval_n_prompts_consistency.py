@@ -1,7 +1,9 @@
+from collections import Counter
 from pydantic import BaseModel
 from .dataset_loader import Sample
-from .gemini import generate_content
-from .grader import grade_answers
+from .gemini import generate_candidates, generate_content
+from .grader import Grade, GradedBy, grade_answers, short_answer
+from .pipeline import Step, run_pipeline
 
 
 SOLVE_PROMPT = """Solve the given word problem.
@@ -25,6 +27,12 @@ Solution: The approach speed is 60 + 80 = 140 mph. So, the two trains will meet
 ```
 """
 
+CANDIDATE_COUNT = 3
+# eval_n_prompts_consistency_early_exit first generates this many candidates,
+# and when they reach the same short answer takes it without generating the
+# rest or the combine call.
+AGREEMENT_THRESHOLD = 2
+
 COMBINE_PROMPT = """You are given three solution candidates to a question.
 Reproduce a new solution from parts of the 3 solutions that are consistent among them.
 """
@@ -35,40 +43,134 @@ class Experiment(BaseModel, frozen=True):
     human_answer: str
     llm_answer: str
     grade: int
+    graded_by: GradedBy = "llm"
+    # Solve and combine calls, not counting grading.
+    calls: int | None = None
 
 
-async def eval_n_prompts_consistency(
-    model: str,
-    sample: Sample,
-) -> Experiment:
-    candidate_1 = await generate_content(
-        model=model, prompt=SOLVE_PROMPT, input=sample.question
+def _agreed_candidate(candidates: list[str]) -> str | None:
+    """The first candidate whose short answer AGREEMENT_THRESHOLD candidates share."""
+    votes = Counter(short_answer(candidate) for candidate in candidates)
+    for candidate in candidates:
+        if votes[short_answer(candidate)] >= AGREEMENT_THRESHOLD:
+            return candidate
+    return None
+
+
+async def _solve(*, model: str, sample: Sample) -> list[str]:
+    return await generate_candidates(
+        model=model,
+        prompt=SOLVE_PROMPT,
+        input=sample.question,
+        candidate_count=CANDIDATE_COUNT,
     )
-    candidate_2 = await generate_content(
-        model=model, prompt=SOLVE_PROMPT, input=sample.question
+
+
+async def _solve_until_agreement(*, model: str, sample: Sample) -> list[str]:
+    candidates = await generate_candidates(
+        model=model,
+        prompt=SOLVE_PROMPT,
+        input=sample.question,
+        candidate_count=AGREEMENT_THRESHOLD,
     )
-    candidate_3 = await generate_content(
-        model=model, prompt=SOLVE_PROMPT, input=sample.question
+    if len(candidates) >= CANDIDATE_COUNT or _agreed_candidate(candidates) is not None:
+        return candidates
+
+    # The rest in one request, drawn independently of the first.
+    return candidates + await generate_candidates(
+        model=model,
+        prompt=SOLVE_PROMPT,
+        input=sample.question,
+        candidate_count=CANDIDATE_COUNT - len(candidates),
+        draw=1,
     )
-    model_answer = await generate_content(
+
+
+async def _combine(*, model: str, sample: Sample, candidates: list[str]) -> str:
+    return await generate_content(
         model=model,
         prompt=COMBINE_PROMPT,
-        input=(
-            f"{sample.question}\n\n"
-            f"Candidate 1: {candidate_1}\n\n"
-            f"Candidate 2: {candidate_2}\n\n"
-            f"Candidate 3: {candidate_3}"
+        input="\n\n".join(
+            [sample.question]
+            + [
+                f"Candidate {i}: {candidate}"
+                for i, candidate in enumerate(candidates, start=1)
+            ]
         ),
     )
-    grade = await grade_answers(
+
+
+async def _combine_unless_agreed(
+    *, model: str, sample: Sample, candidates: list[str]
+) -> str:
+    agreed_candidate = _agreed_candidate(candidates)
+    if agreed_candidate is not None:
+        return agreed_candidate
+    return await _combine(model=model, sample=sample, candidates=candidates)
+
+
+async def _grade(*, model: str, sample: Sample, model_answer: str) -> Grade:
+    return await grade_answers(
         model=model,
         question=sample.question,
         human_answer=sample.answer,
         model_answer=model_answer,
     )
+
+
+_STEPS = [
+    Step(name="candidates", func=_solve, inputs=("model", "sample")),
+    Step(
+        name="model_answer",
+        func=_combine,
+        inputs=("model", "sample", "candidates"),
+    ),
+    Step(name="grade", func=_grade, inputs=("model", "sample", "model_answer")),
+]
+
+_EARLY_EXIT_STEPS = [
+    Step(name="candidates", func=_solve_until_agreement, inputs=("model", "sample")),
+    Step(
+        name="model_answer",
+        func=_combine_unless_agreed,
+        inputs=("model", "sample", "candidates"),
+    ),
+    Step(name="grade", func=_grade, inputs=("model", "sample", "model_answer")),
+]
+
+
+def _count_early_exit_calls(candidates: list[str]) -> int:
+    solve_calls = 1 if len(candidates) <= AGREEMENT_THRESHOLD else 2
+    combine_calls = 0 if _agreed_candidate(candidates) is not None else 1
+    return solve_calls + combine_calls
+
+
+async def eval_n_prompts_consistency(
+    model: str,
+    sample: Sample,
+) -> Experiment:
+    results = await run_pipeline(_STEPS, model=model, sample=sample)
+    return Experiment(
+        question=sample.question,
+        human_answer=sample.answer,
+        llm_answer=results["model_answer"],
+        grade=results["grade"].grade,
+        graded_by=results["grade"].graded_by,
+        calls=2,
+    )
+
+
+async def eval_n_prompts_consistency_early_exit(
+    model: str,
+    sample: Sample,
+) -> Experiment:
+    """Like eval_n_prompts_consistency, but stops once candidates agree."""
+    results = await run_pipeline(_EARLY_EXIT_STEPS, model=model, sample=sample)
     return Experiment(
         question=sample.question,
         human_answer=sample.answer,
-        llm_answer=model_answer,
-        grade=grade,
+        llm_answer=results["model_answer"],
+        grade=results["grade"].grade,
+        graded_by=results["grade"].graded_by,
+        calls=_count_early_exit_calls(results["candidates"]),
     )
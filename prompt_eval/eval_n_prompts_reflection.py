@@ -1,28 +1,12 @@
 from pydantic import BaseModel
+import re
 from .dataset_loader import Sample
+from .eval_baseline import SOLVE_PROMPT
 from .gemini import generate_content
-from .grader import grade_answers
+from .grader import Grade, GradedBy, grade_answers
+from .pipeline import Step, run_pipeline
 
 
-SOLVE_PROMPT = """Solve the given word problem. Respond in the following format:
-
-```
-<Your step-by-step reasoning>
-#### <Your final answer in succint form>
-```
-
-For example, suppose the word problem is this:
-```
-A train leaves New York for Boston, 200 miles away, at 3:00 PM. Another train leaves Boston for New York at the same time. The first train travels at 60 mph, and the second train travels at 80 mph. At what time do the two trains pass each other?
-```
-
-Your reply could be this:
-```
-The approach speed is 60 + 80 = 140 mph. So, the two trains will meet in 200 / 140 = 1.43 hours. Since the first train left at 3:00 PM, the two trains will meet at 3:00 PM + 1.43 hours = 4:26 PM.
-#### 4:00 PM
-```
-"""
-
 REFLECT_PROMPT = """Critique the answer for a question.
 Do not try to solve the problem again. Simply check the correctness of each step of the initial answer. 
 
@@ -53,6 +37,30 @@ Your reply should be in the following format:
 ```
 """
 
+CRITIQUE_CHECK_PROMPT = """You are given a critique of an answer to a question.
+If the critique finds an error in the answer, respond with "1".
+If the critique finds the answer correct, respond with "0".
+Do not respond with any other text.
+"""
+
+# Only a verdict on the whole answer counts as no error. A critique that
+# checks each step says "Step 1 is correct" whether or not a later step is
+# wrong.
+_NO_ERROR = re.compile(
+    r"\b(?:the (?:initial |final )?(?:answer|solution) is"
+    r" (?:entirely |completely |fully )?correct"
+    r"|all (?:the )?steps are correct)\b",
+    re.IGNORECASE,
+)
+_CAVEAT = re.compile(
+    r"\b(?:but|however|except|although|though|instead|not)\b|n't", re.IGNORECASE
+)
+_ERROR = re.compile(
+    r"\b(?:incorrect|errors?|mistakes?|wrong|should be|flawed"
+    r"|miscalculat\w*|inaccura\w*)\b",
+    re.IGNORECASE,
+)
+
 
 class Experiment(BaseModel, frozen=True):
     question: str
@@ -61,36 +69,160 @@ class Experiment(BaseModel, frozen=True):
     reflection: str
     final_model_answer: str
     grade: int
+    graded_by: GradedBy = "llm"
+    revised: bool | None = None
 
 
-async def eval_n_prompts_reflection(
-    model: str,
-    sample: Sample,
-) -> Experiment:
-    initial_answer = await generate_content(
+async def _solve(*, model: str, sample: Sample) -> str:
+    # The same call as in eval_baseline, so both evals share one response.
+    return await generate_content(
         model=model, prompt=SOLVE_PROMPT, input=sample.question
     )
-    reflection = await generate_content(
+
+
+async def _reflect(*, model: str, sample: Sample, initial_answer: str) -> str:
+    return await generate_content(
         model=model,
         prompt=REFLECT_PROMPT,
         input=f"Question: {sample.question}\nAnswer: {initial_answer}",
     )
-    final_answer = await generate_content(
+
+
+def _classify_critique(reflection: str) -> bool | None:
+    """Whether the critique reports an error, or None if that is unclear."""
+    no_error = _NO_ERROR.search(reflection)
+    error = _ERROR.search(reflection)
+    if no_error and not error and not _CAVEAT.search(reflection):
+        return False
+    if error and not no_error:
+        return True
+    return None
+
+
+async def _critique_found_error(*, model: str, reflection: str) -> bool:
+    found_error = _classify_critique(reflection)
+    if found_error is not None:
+        return found_error
+
+    verdict = await generate_content(
+        model=model, prompt=CRITIQUE_CHECK_PROMPT, input=reflection, temperature=0
+    )
+    # Anything but a clear "0" is revised, as it would be without the check.
+    return verdict.strip() != "0"
+
+
+async def _revise(
+    *,
+    model: str,
+    sample: Sample,
+    initial_answer: str,
+    reflection: str,
+) -> str:
+    return await generate_content(
         model=model,
         prompt=REVISE_PROMPT,
         input=f"Question: {sample.question}\nAnswer: {initial_answer}\nCritique: {reflection}",
     )
-    grade = await grade_answers(
+
+
+async def _revise_if_error(
+    *,
+    model: str,
+    sample: Sample,
+    initial_answer: str,
+    reflection: str,
+    critique_found_error: bool,
+) -> str:
+    if not critique_found_error:
+        return initial_answer
+    return await _revise(
+        model=model,
+        sample=sample,
+        initial_answer=initial_answer,
+        reflection=reflection,
+    )
+
+
+async def _grade(*, model: str, sample: Sample, final_answer: str) -> Grade:
+    return await grade_answers(
         model=model,
         question=sample.question,
         human_answer=sample.answer,
         model_answer=final_answer,
     )
+
+
+_STEPS = [
+    Step(name="initial_answer", func=_solve, inputs=("model", "sample")),
+    Step(
+        name="reflection",
+        func=_reflect,
+        inputs=("model", "sample", "initial_answer"),
+    ),
+    Step(
+        name="final_answer",
+        func=_revise,
+        inputs=("model", "sample", "initial_answer", "reflection"),
+    ),
+    Step(name="grade", func=_grade, inputs=("model", "sample", "final_answer")),
+]
+
+_SKIP_REVISE_STEPS = [
+    Step(name="initial_answer", func=_solve, inputs=("model", "sample")),
+    Step(
+        name="reflection",
+        func=_reflect,
+        inputs=("model", "sample", "initial_answer"),
+    ),
+    Step(
+        name="critique_found_error",
+        func=_critique_found_error,
+        inputs=("model", "reflection"),
+    ),
+    Step(
+        name="final_answer",
+        func=_revise_if_error,
+        inputs=(
+            "model",
+            "sample",
+            "initial_answer",
+            "reflection",
+            "critique_found_error",
+        ),
+    ),
+    Step(name="grade", func=_grade, inputs=("model", "sample", "final_answer")),
+]
+
+
+async def eval_n_prompts_reflection(
+    model: str,
+    sample: Sample,
+) -> Experiment:
+    results = await run_pipeline(_STEPS, model=model, sample=sample)
     return Experiment(
         question=sample.question,
         human_answer=sample.answer,
-        initial_model_answer=initial_answer,
-        reflection=reflection,
-        final_model_answer=final_answer,
-        grade=grade,
+        initial_model_answer=results["initial_answer"],
+        reflection=results["reflection"],
+        final_model_answer=results["final_answer"],
+        grade=results["grade"].grade,
+        graded_by=results["grade"].graded_by,
+    )
+
+
+async def eval_n_prompts_reflection_skip_revise(
+    model: str,
+    sample: Sample,
+) -> Experiment:
+    """Like eval_n_prompts_reflection, but skips revising an answer without error."""
+    results = await run_pipeline(_SKIP_REVISE_STEPS, model=model, sample=sample)
+    return Experiment(
+        question=sample.question,
+        human_answer=sample.answer,
+        initial_model_answer=results["initial_answer"],
+        reflection=results["reflection"],
+        final_model_answer=results["final_answer"],
+        grade=results["grade"].grade,
+        graded_by=results["grade"].graded_by,
+        revised=results["critique_found_error"],
     )
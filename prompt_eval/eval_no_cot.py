@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from .dataset_loader import Sample
 from .gemini import generate_content
-from .grader import grade_answers
+from .grader import GradedBy, grade_answers
 
 
 SOLVE_PROMPT = """Solve the given word problem. Respond in the following format:
@@ -27,6 +27,7 @@ class Experiment(BaseModel, frozen=True):
     human_answer: str
     llm_answer: str
     grade: int
+    graded_by: GradedBy = "llm"
 
 
 async def eval_no_cot(model: str, sample: Sample) -> Experiment:
@@ -43,5 +44,6 @@ async def eval_no_cot(model: str, sample: Sample) -> Experiment:
         question=sample.question,
         human_answer=sample.answer,
         llm_answer=model_answer,
-        grade=grade,
+        grade=grade.grade,
+        graded_by=grade.graded_by,
     )
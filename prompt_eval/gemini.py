@@ -1,25 +1,217 @@
-import google.generativeai as genai
+import asyncio
+from contextvars import ContextVar
+from google.api_core.exceptions import ResourceExhausted
+import json
+import time
+from typing import Any
+from .client_pool import get_client_pool
 from .decorators import (
     retry_on_resource_exhausted,
     retry_on_internal_server_error,
 )
+from .metrics import get_metrics, stage_labels
+from .rate_limiter import estimate_tokens, get_rate_limiter
+from .response_cache import ResponseCache, get_response_cache
+from .tracing import trace_span
+
+
+class RequestCounter:
+    def __init__(self) -> None:
+        self.requests = 0
+
+
+_request_counter: ContextVar[RequestCounter | None] = ContextVar(
+    "request_counter", default=None
+)
+
+
+_calls_in_flight: dict[str, asyncio.Task[list[str]]] = {}
+
+
+def start_request_counter() -> RequestCounter:
+    """Counts requests sent by the current task and the tasks it starts later.
+
+    Retries count as separate requests. Cache hits, and calls that share an
+    identical call's request, do not count.
+    """
+    counter = RequestCounter()
+    _request_counter.set(counter)
+    return counter
 
 
-@retry_on_resource_exhausted
-@retry_on_internal_server_error
 async def generate_content(
     *,
     model: str,
     prompt: str,
     input: str,
+    temperature: float | None = None,
 ) -> str:
-    m = genai.GenerativeModel(
-        model,
+    (response,) = await generate_candidates(
+        model=model,
+        prompt=prompt,
+        input=input,
+        candidate_count=1,
+        temperature=temperature,
+    )
+    return response
+
+
+async def generate_candidates(
+    *,
+    model: str,
+    prompt: str,
+    input: str,
+    candidate_count: int,
+    temperature: float | None = None,
+    draw: int = 0,
+) -> list[str]:
+    """Generates `candidate_count` responses in one request.
+
+    Responses are served from the response cache when it is enabled, and a
+    call made while an identical one is in flight waits for its response.
+    Calls with the same arguments share a response. For independent samples
+    of the same request, give each a different `draw`, which is part of the
+    cache key but is not sent to the model.
+    """
+    generation_config = {
+        key: value
+        for key, value in {
+            "candidate_count": candidate_count,
+            "temperature": temperature,
+        }.items()
+        if value is not None
+    }
+
+    key = ResponseCache.make_key(
+        model=model,
         system_instruction=prompt,
+        input=input,
+        generation_config=generation_config,
+        draw=draw,
     )
-    response = await m.generate_content_async(input)
+    response_cache = get_response_cache()
+    if response_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    # Identical calls in flight at the same time, such as the same step of two
+    # eval functions on one sample, share one request.
+    call = _calls_in_flight.get(key)
+    if call is None:
+        call = asyncio.create_task(
+            _generate_and_cache(
+                key,
+                model=model,
+                prompt=prompt,
+                input=input,
+                generation_config=generation_config,
+            )
+        )
+        _calls_in_flight[key] = call
+        call.add_done_callback(lambda _: _calls_in_flight.pop(key, None))
+    return list(await asyncio.shield(call))
+
+
+async def _generate_and_cache(
+    key: str,
+    *,
+    model: str,
+    prompt: str,
+    input: str,
+    generation_config: dict[str, Any],
+) -> list[str]:
+    responses = await _generate_candidates(
+        model=model,
+        prompt=prompt,
+        input=input,
+        generation_config=generation_config,
+    )
+    response_cache = get_response_cache()
+    if response_cache:
+        response_cache.put(key, json.dumps(responses))
+    return responses
+
+
+@retry_on_resource_exhausted
+@retry_on_internal_server_error
+async def _generate_candidates(
+    *,
+    model: str,
+    prompt: str,
+    input: str,
+    generation_config: dict[str, Any],
+) -> list[str]:
+    m = get_client_pool().get_model(model, prompt)
+
+    metrics = get_metrics()
+    labels = stage_labels()
+
+    rate_limiter = get_rate_limiter(model)
+    estimated_tokens = estimate_tokens(prompt, input)
+    if rate_limiter:
+        start = time.perf_counter()
+        with trace_span("rate_limit", "queue"):
+            await rate_limiter.acquire(estimated_tokens)
+        if metrics:
+            metrics.inc(
+                "prompt_eval_rate_limit_wait_seconds_total",
+                time.perf_counter() - start,
+                **labels,
+            )
+
+    request_counter = _request_counter.get()
+    if request_counter:
+        request_counter.requests += 1
+
+    if metrics:
+        metrics.add("prompt_eval_calls_in_flight", 1)
+    start = time.perf_counter()
+    try:
+        with trace_span("generate_content", "call", **labels) as span_args:
+            try:
+                response = await m.generate_content_async(
+                    input, generation_config=generation_config
+                )
+            except Exception as e:
+                span_args["error"] = type(e).__name__
+                raise
+    except ResourceExhausted:
+        if rate_limiter:
+            rate_limiter.back_off()
+        raise
+    finally:
+        if metrics:
+            metrics.add("prompt_eval_calls_in_flight", -1)
+            metrics.observe(
+                "prompt_eval_call_latency_seconds",
+                time.perf_counter() - start,
+                **labels,
+            )
+
+    if rate_limiter and response.usage_metadata:
+        rate_limiter.reconcile(
+            estimated_tokens=estimated_tokens,
+            actual_tokens=response.usage_metadata.total_token_count,
+        )
+    if metrics and response.usage_metadata:
+        metrics.inc(
+            "prompt_eval_input_tokens_total",
+            response.usage_metadata.prompt_token_count,
+            **labels,
+        )
+        metrics.inc(
+            "prompt_eval_output_tokens_total",
+            response.usage_metadata.candidates_token_count,
+            **labels,
+        )
 
-    if not response.parts:
+    if not response.candidates or not all(
+        candidate.content.parts for candidate in response.candidates
+    ):
         raise ValueError(f"Empty response: {response}")
 
-    return response.text
+    return [
+        "".join(part.text for part in candidate.content.parts)
+        for candidate in response.candidates
+    ]
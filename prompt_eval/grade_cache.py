@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import sqlite3
+
+
+FLUSH_INTERVAL_SEC = 15
+
+
+class GradeCache:
+    """LLM grades of short answers, in a local SQLite file.
+
+    A grade is keyed on the question id and the normalized reference and model
+    short answers, so it is shared by every eval function and every run that
+    reaches the same answer to the same question.
+
+    Grades are committed only on `flush`, so grading never waits on the disk.
+    Run `flush_periodically` so that a crash loses at most
+    `flush_interval_sec` of grades.
+    """
+
+    def __init__(
+        self, filename: str, *, flush_interval_sec: float = FLUSH_INTERVAL_SEC
+    ) -> None:
+        self._flush_interval_sec = flush_interval_sec
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS grades (
+                sample_id TEXT NOT NULL,
+                human_short_answer TEXT NOT NULL,
+                model_short_answer TEXT NOT NULL,
+                grade INTEGER NOT NULL,
+                PRIMARY KEY (sample_id, human_short_answer, model_short_answer)
+            )"""
+        )
+        self._connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, *, sample_id: str, human_short_answer: str, model_short_answer: str
+    ) -> int | None:
+        row = self._connection.execute(
+            """SELECT grade FROM grades WHERE sample_id = ?
+            AND human_short_answer = ? AND model_short_answer = ?""",
+            (sample_id, human_short_answer, model_short_answer),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(
+        self,
+        *,
+        sample_id: str,
+        human_short_answer: str,
+        model_short_answer: str,
+        grade: int,
+    ) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO grades VALUES (?, ?, ?, ?)",
+            (sample_id, human_short_answer, model_short_answer, grade),
+        )
+
+    def flush(self) -> None:
+        self._connection.commit()
+
+    async def flush_periodically(self) -> None:
+        """Flushes every `flush_interval_sec` until cancelled."""
+        while True:
+            await asyncio.sleep(self._flush_interval_sec)
+            self.flush()
+
+    def log_stats(self) -> None:
+        logging.info(f"Grade cache: {self.hits} hits, {self.misses} misses.")
+
+
+_grade_cache: GradeCache | None = None
+
+
+def configure_grade_cache(filename: str) -> GradeCache:
+    global _grade_cache
+    _grade_cache = GradeCache(filename)
+    return _grade_cache
+
+
+def get_grade_cache() -> GradeCache | None:
+    return _grade_cache
@@ -1,5 +1,14 @@
+import asyncio
+import contextvars
+from decimal import Decimal
+from pydantic import BaseModel
 import re
+from typing import Literal, TypeAlias
+from .dataset_loader import sample_id
 from .gemini import generate_content
+from .grade_cache import get_grade_cache
+from .metrics import stage
+from .tracing import trace_span
 
 
 _GRADE_PROMPT = """Given a word problem, two responses are provided.
@@ -23,27 +32,314 @@ Your reply should be a single character:
 """
 
 
+_PACKED_GRADE_PROMPT = """Given several word problems, each with two responses, judge each one separately.
+The first response is the reference answer, which is correct.
+The second one is the model's answer, which may or may not be correct.
+Your job is to judge if the model's answer is the same as the reference answer.
+
+For each item, respond with one line: the item number, a colon, and "1" if the model's answer is the same as the reference answer, or "0" otherwise.
+Do not respond with any other text.
+
+For example, suppose you are given this:
+
+```
+Item 1
+Question: A train leaves New York for Boston, 200 miles away, at 3:00 PM. Another train leaves Boston for New York at the same time. The first train travels at 60 mph, and the second train travels at 80 mph. At what time do the two trains pass each other?
+Reference Answer: 4:00 PM
+Model Answer: 4:00 PM
+
+Item 2
+Question: Tom has 3 apples and buys 2 more. How many apples does he have?
+Reference Answer: 5
+Model Answer: 6 apples
+```
+
+Your reply should be:
+1: 1
+2: 0
+"""
+
+_VERDICT = re.compile(r"^\s*(?:item\s*)?(\d+)\s*[:.)]\s*([01])\s*$", re.I | re.M)
+
+
+GradedBy: TypeAlias = Literal["local", "llm"]
+
+
+class Grade(BaseModel, frozen=True):
+    grade: int
+    graded_by: GradedBy
+
+
 async def grade_answers(
     *, model: str, question: str, human_answer: str, model_answer: str
-) -> int:
+) -> Grade:
+    """Grades locally when the short answers are clear, otherwise asks the LLM.
+
+    LLM grades are reused from the grade cache when it is enabled.
+    """
+    human_short_answer = _extract_answer(human_answer)
+    model_short_answer = _extract_answer(model_answer)
+    local_grade = _grade_locally(
+        human_short_answer=human_short_answer,
+        model_short_answer=model_short_answer,
+    )
+    if local_grade is not None:
+        return Grade(grade=local_grade, graded_by="local")
+
+    grade_cache = get_grade_cache()
+    cache_key = {
+        "sample_id": sample_id(question),
+        "human_short_answer": _normalize_answer(human_short_answer),
+        "model_short_answer": _normalize_answer(model_short_answer),
+    }
+    if grade_cache:
+        cached_grade = grade_cache.get(**cache_key)
+        if cached_grade is not None:
+            return Grade(grade=cached_grade, graded_by="llm")
+
+    grading_input = _format_grading_input(
+        question=question,
+        human_answer=human_answer,
+        model_answer=model_answer,
+    )
+    with stage("grade"), trace_span("grade", "stage"):
+        if _grade_batch_size > 1:
+            llm_grade = await _get_grade_batcher(model).grade(grading_input)
+        else:
+            llm_grade = await _grade_with_llm(model, grading_input)
+    if grade_cache:
+        grade_cache.put(**cache_key, grade=llm_grade)
+    return Grade(grade=llm_grade, graded_by="llm")
+
+
+async def _grade_with_llm(model: str, grading_input: str) -> int:
     grade = await generate_content(
-        model=model,
-        prompt=_GRADE_PROMPT,
-        input=_format_grading_input(
-            question=question,
-            human_answer=human_answer,
-            model_answer=model_answer,
-        ),
+        model=model, prompt=_GRADE_PROMPT, input=grading_input
     )
     return int(grade.strip())
 
 
+def _parse_verdicts(response: str, count: int) -> list[int] | None:
+    """The grades of items 1 to `count`, or None unless each has one verdict."""
+    verdicts: dict[int, int] = {}
+    for match in _VERDICT.finditer(response):
+        item, grade = int(match[1]), int(match[2])
+        if item in verdicts and verdicts[item] != grade:
+            return None
+        verdicts[item] = grade
+    if sorted(verdicts) != list(range(1, count + 1)):
+        return None
+    return [verdicts[item] for item in range(1, count + 1)]
+
+
+class _GradeBatcher:
+    """Packs grading requests made close together into one LLM call.
+
+    A batch is sent once it has `batch_size` items, or `max_wait_sec` after
+    its first item. If the reply cannot be parsed, each item of the batch is
+    graded on its own.
+    """
+
+    def __init__(self, model: str, *, batch_size: int, max_wait_sec: float) -> None:
+        self._model = model
+        self._batch_size = batch_size
+        self._max_wait_sec = max_wait_sec
+        self._pending: list[tuple[str, asyncio.Future[int]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._batches: set[asyncio.Task[None]] = set()
+
+    async def grade(self, grading_input: str) -> int:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((grading_input, future))
+        if len(self._pending) >= self._batch_size:
+            self._send()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._max_wait_sec, self._send
+            )
+        return await future
+
+    def _send(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # A fresh context, so the packed request is not counted, labelled or
+        # traced as part of whichever sample happened to send the batch.
+        task = asyncio.create_task(
+            self._run_batch(batch), context=contextvars.Context()
+        )
+        # The event loop only keeps weak references to tasks.
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: list[tuple[str, asyncio.Future[int]]]) -> None:
+        with stage("grade"), trace_span("grade_batch", "stage", items=len(batch)):
+            await self._grade_batch(batch)
+
+    async def _grade_batch(self, batch: list[tuple[str, asyncio.Future[int]]]) -> None:
+        grades = None
+        if len(batch) > 1:
+            try:
+                response = await generate_content(
+                    model=self._model,
+                    prompt=_PACKED_GRADE_PROMPT,
+                    input="\n\n".join(
+                        f"Item {i}\n{grading_input}"
+                        for i, (grading_input, _) in enumerate(batch, start=1)
+                    ),
+                )
+                grades = _parse_verdicts(response, len(batch))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+        if grades is None:
+            results = await asyncio.gather(
+                *[
+                    _grade_with_llm(self._model, grading_input)
+                    for grading_input, _ in batch
+                ],
+                return_exceptions=True,
+            )
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            return
+
+        for (_, future), grade in zip(batch, grades):
+            if not future.done():
+                future.set_result(grade)
+
+
+_grade_batch_size = 1
+_grade_batch_max_wait_sec = 0.0
+_grade_batchers: dict[str, _GradeBatcher] = {}
+
+
+def configure_grade_batching(*, batch_size: int, max_wait_sec: float) -> None:
+    """Packs up to `batch_size` LLM grading requests into one call.
+
+    A request waits at most `max_wait_sec` for others to join it. A batch size
+    of 1 sends each request on its own.
+    """
+    global _grade_batch_size, _grade_batch_max_wait_sec
+    _grade_batch_size = batch_size
+    _grade_batch_max_wait_sec = max_wait_sec
+    _grade_batchers.clear()
+
+
+def _get_grade_batcher(model: str) -> _GradeBatcher:
+    if model not in _grade_batchers:
+        _grade_batchers[model] = _GradeBatcher(
+            model,
+            batch_size=_grade_batch_size,
+            max_wait_sec=_grade_batch_max_wait_sec,
+        )
+    return _grade_batchers[model]
+
+
+_NUMERIC_ANSWER = re.compile(
+    r"(?P<currency>[$€£])?\s*(?P<number>-?\d+(?:\.\d+)?)\s*(?P<percent>%)?"
+    r"\s*(?P<unit>[a-z][a-z .'/-]*)?"
+)
+
+# A differing number is only graded wrong locally when it counts things. With
+# any other unit, such as "1 hour" for a reference of "60", it may be the same
+# quantity in another scale, so it is left to the LLM grader.
+_COUNT_NOUNS = {
+    "apple",
+    "bag",
+    "book",
+    "box",
+    "car",
+    "child",
+    "children",
+    "cookie",
+    "cupcake",
+    "egg",
+    "item",
+    "marble",
+    "page",
+    "people",
+    "person",
+    "piece",
+    "point",
+    "student",
+    "ticket",
+    "time",
+    "toy",
+    "tree",
+}
+
+
+def _is_count_noun(unit: str) -> bool:
+    return any(unit.removesuffix(suffix) in _COUNT_NOUNS for suffix in ("", "s", "es"))
+
+
+def _normalize_answer(answer: str) -> str:
+    answer = answer.lower().replace("*", "").strip().rstrip(".").strip()
+    answer = re.sub(r"(?<=\d),(?=\d{3})", "", answer)
+    return re.sub(r"\s+", " ", answer)
+
+
+def _parse_numeric_answer(answer: str) -> tuple[Decimal, bool, str] | None:
+    """The number, whether it is a percentage, and its unit."""
+    match = _NUMERIC_ANSWER.fullmatch(answer)
+    if not match:
+        return None
+    return (
+        Decimal(match["number"]),
+        bool(match["percent"]),
+        (match["unit"] or "").strip(),
+    )
+
+
+def _grade_locally(*, human_short_answer: str, model_short_answer: str) -> int | None:
+    """The grade if it is clear without the LLM, otherwise None."""
+    human = _normalize_answer(human_short_answer)
+    llm = _normalize_answer(model_short_answer)
+    if human == llm:
+        return 1
+
+    human_numeric = _parse_numeric_answer(human)
+    llm_numeric = _parse_numeric_answer(llm)
+    if not human_numeric or not llm_numeric:
+        return None
+
+    human_number, human_percent, human_unit = human_numeric
+    llm_number, llm_percent, llm_unit = llm_numeric
+    if human_number == llm_number:
+        # "3" is not "3 dozen", and "5" is not "5 or more".
+        if human_unit != llm_unit and (
+            (human_unit and llm_unit) or not _is_count_noun(human_unit or llm_unit)
+        ):
+            return None
+        return 1
+    if human_percent != llm_percent:
+        return None
+    if not all(_is_count_noun(unit) for unit in (human_unit, llm_unit) if unit):
+        return None
+    return 0
+
+
 def _extract_answer(solution: str) -> str:
     boundary = r"^####\s"
     result = re.split(boundary, solution, flags=re.MULTILINE)
     return result[-1].strip()
 
 
+def short_answer(solution: str) -> str:
+    """The normalized final answer of a solution, for comparing solutions."""
+    return _normalize_answer(_extract_answer(solution))
+
+
 def _format_grading_input(
     *, question: str, human_answer: str, model_answer: str
 ) -> str:
@@ -0,0 +1,173 @@
+"""A local stand-in for GenerativeModel, for running evals offline.
+
+Install it with
+
+    configure_client_pool(channel_pool_size=1, model_factory=LocalGenerativeModel)
+
+To simulate a slow or failing service, bind a `LocalBehavior`:
+
+    configure_client_pool(
+        channel_pool_size=1,
+        model_factory=functools.partial(
+            LocalGenerativeModel, behavior=LocalBehavior(median_latency_sec=0.5)
+        ),
+    )
+"""
+
+import asyncio
+from collections import Counter
+from google.api_core.exceptions import (
+    DeadlineExceeded,
+    InternalServerError,
+    ResourceExhausted,
+)
+import hashlib
+import math
+from pydantic import BaseModel
+import random
+from typing import Any, Callable, TypeAlias
+
+
+Responder: TypeAlias = Callable[[str, str, random.Random], str]
+
+
+class LocalPart(BaseModel, frozen=True):
+    text: str
+
+
+class LocalContent(BaseModel, frozen=True):
+    parts: list[LocalPart]
+
+
+class LocalCandidate(BaseModel, frozen=True):
+    content: LocalContent
+
+
+class LocalUsageMetadata(BaseModel, frozen=True):
+    prompt_token_count: int
+    candidates_token_count: int
+    total_token_count: int
+
+
+class LocalResponse(BaseModel, frozen=True):
+    candidates: list[LocalCandidate]
+    usage_metadata: LocalUsageMetadata
+
+
+class LocalBehavior(BaseModel, frozen=True):
+    """How a LocalGenerativeModel responds, besides what it answers.
+
+    Latency is log-normal around `median_latency_sec`, with `latency_sigma`
+    as the standard deviation of its logarithm, plus `sec_per_output_token`
+    for each output token. The error rates are the chance that a call fails
+    with that error. A DeadlineExceeded call fails after its full latency,
+    the others fail at once.
+
+    `output_tokens`, when set, replaces the output token count derived from
+    the response text in `usage_metadata`.
+    """
+
+    median_latency_sec: float = 0.0
+    latency_sigma: float = 0.0
+    sec_per_output_token: float = 0.0
+    output_tokens: int | None = None
+    resource_exhausted_rate: float = 0.0
+    internal_server_error_rate: float = 0.0
+    deadline_exceeded_rate: float = 0.0
+    seed: int = 0
+
+
+def guess_answer(system_instruction: str, input: str, rng: random.Random) -> str:
+    """Answers with a random small number in the `#### <answer>` format."""
+    answer = rng.randint(0, 9)
+    return f"The answer is {answer}.\n#### {answer}"
+
+
+def _count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+class LocalGenerativeModel:
+    """Answers like GenerativeModel, without a network call.
+
+    Each model draws new candidates for a request it has seen before, like a
+    real model sampling, but the n-th identical request gives the same
+    candidates in every run. With temperature 0, all candidates are the same.
+    Latency and errors follow `behavior` and do not depend on the request.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        system_instruction: str,
+        respond: Responder = guess_answer,
+        behavior: LocalBehavior = LocalBehavior(),
+    ) -> None:
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.calls = 0
+        self._requests: Counter[tuple[str, int]] = Counter()
+        self._respond = respond
+        self._behavior = behavior
+        self._rng = random.Random(f"{behavior.seed}\0{system_instruction}")
+
+    async def generate_content_async(
+        self,
+        contents: str,
+        *,
+        generation_config: dict[str, Any] | None = None,
+    ) -> LocalResponse:
+        self.calls += 1
+        behavior = self._behavior
+        if self._rng.random() < behavior.resource_exhausted_rate:
+            raise ResourceExhausted("Local model: simulated resource exhaustion")
+        if self._rng.random() < behavior.internal_server_error_rate:
+            raise InternalServerError("Local model: simulated internal error")
+        deadline_exceeded = self._rng.random() < behavior.deadline_exceeded_rate
+        latency_sec = behavior.median_latency_sec * math.exp(
+            self._rng.gauss(0, behavior.latency_sigma)
+        )
+
+        generation_config = generation_config or {}
+        candidate_count = generation_config.get("candidate_count", 1)
+        temperature = generation_config.get("temperature", 1.0)
+
+        repeat = self._requests[contents, candidate_count]
+        self._requests[contents, candidate_count] += 1
+
+        texts = []
+        for i in range(candidate_count):
+            digest = hashlib.sha256(
+                (
+                    f"{self.system_instruction}\0{contents}\0"
+                    + (f"{candidate_count}\0{repeat}\0{i}" if temperature else "")
+                ).encode()
+            ).digest()
+            rng = random.Random(digest)
+            texts.append(self._respond(self.system_instruction, contents, rng))
+
+        prompt_token_count = _count_tokens(self.system_instruction + contents)
+        candidates_token_count = (
+            behavior.output_tokens
+            if behavior.output_tokens is not None
+            else sum(_count_tokens(text) for text in texts)
+        )
+
+        await asyncio.sleep(
+            latency_sec + behavior.sec_per_output_token * candidates_token_count
+        )
+        if deadline_exceeded:
+            raise DeadlineExceeded("Local model: simulated deadline exceeded")
+
+        return LocalResponse(
+            candidates=[
+                LocalCandidate(content=LocalContent(parts=[LocalPart(text=text)]))
+                for text in texts
+            ],
+            usage_metadata=LocalUsageMetadata(
+                prompt_token_count=prompt_token_count,
+                candidates_token_count=candidates_token_count,
+                total_token_count=prompt_token_count + candidates_token_count,
+            ),
+        )
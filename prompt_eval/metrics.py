@@ -0,0 +1,177 @@
+import asyncio
+import bisect
+import contextlib
+from contextvars import ContextVar
+import json
+import os
+from typing import Any, Iterator
+
+
+FLUSH_INTERVAL_SEC = 15
+LATENCY_BUCKETS_SEC = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+Labels = tuple[tuple[str, str], ...]
+
+
+_eval_func: ContextVar[str] = ContextVar("eval_func", default="")
+_stage: ContextVar[str] = ContextVar("stage", default="generate")
+
+
+def set_eval_func(eval_func: str) -> None:
+    """Labels the metrics of the current task and the tasks it starts later."""
+    _eval_func.set(eval_func)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Labels the metrics of calls made inside the block with stage `name`."""
+    token = _stage.set(name)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+
+
+def stage_labels() -> dict[str, str]:
+    """The eval function and stage of the current call."""
+    return {"eval_func": _eval_func.get(), "stage": _stage.get()}
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    items = [*labels, *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Metrics:
+    """Counters, gauges and histograms, written to a file as a snapshot.
+
+    The file is in the Prometheus text format, or JSON if `filename` ends in
+    ".json". It is replaced atomically on each flush.
+    """
+
+    def __init__(
+        self, filename: str, *, flush_interval_sec: float = FLUSH_INTERVAL_SEC
+    ) -> None:
+        self._filename = filename
+        self._flush_interval_sec = flush_interval_sec
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._gauges: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, /, **labels: str) -> None:
+        series = self._counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def add(self, name: str, value: float, /, **labels: str) -> None:
+        """Moves a gauge up or down by `value`."""
+        series = self._gauges.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, /, **labels: str) -> None:
+        self._gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, /, **labels: str) -> None:
+        """Adds a latency in seconds to a histogram."""
+        series = self._histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Histogram(LATENCY_BUCKETS_SEC)
+        series[key].observe(value)
+
+    def snapshot(self) -> dict[str, Any]:
+        def values(series: dict[Labels, float]) -> list[dict[str, Any]]:
+            return [
+                {"labels": dict(labels), "value": value}
+                for labels, value in series.items()
+            ]
+
+        return {
+            "counters": {
+                name: values(series) for name, series in self._counters.items()
+            },
+            "gauges": {name: values(series) for name, series in self._gauges.items()},
+            "histograms": {
+                name: [
+                    {
+                        "labels": dict(labels),
+                        "buckets": list(histogram.buckets),
+                        "counts": histogram.counts,
+                        "sum": histogram.sum,
+                        "count": histogram.count,
+                    }
+                    for labels, histogram in series.items()
+                ]
+                for name, series in self._histograms.items()
+            },
+        }
+
+    def prometheus_text(self) -> str:
+        lines = []
+        for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+            for name, series in metrics.items():
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, histograms in self._histograms.items():
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in histograms.items():
+                cumulative = 0
+                for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"{name}_bucket{_format_labels(labels, le=str(bound))} "
+                        f"{cumulative}"
+                    )
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        content = (
+            json.dumps(self.snapshot(), indent=2)
+            if self._filename.endswith(".json")
+            else self.prometheus_text()
+        )
+        temporary_filename = f"{self._filename}.tmp"
+        with open(temporary_filename, "w") as f:
+            f.write(content)
+        os.replace(temporary_filename, self._filename)
+
+    async def flush_periodically(self) -> None:
+        """Flushes every `flush_interval_sec` until cancelled."""
+        while True:
+            await asyncio.sleep(self._flush_interval_sec)
+            self.flush()
+
+
+_metrics: Metrics | None = None
+
+
+def configure_metrics(
+    filename: str, *, flush_interval_sec: float = FLUSH_INTERVAL_SEC
+) -> Metrics:
+    global _metrics
+    _metrics = Metrics(filename, flush_interval_sec=flush_interval_sec)
+    return _metrics
+
+
+def get_metrics() -> Metrics | None:
+    return _metrics
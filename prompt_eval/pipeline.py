@@ -0,0 +1,66 @@
+import asyncio
+from pydantic import BaseModel
+from typing import Any, Awaitable, Callable, Sequence
+from .metrics import stage
+from .tracing import trace_span
+
+
+class Step(BaseModel, frozen=True):
+    """One call in an eval function.
+
+    `func` is called with the values named in `inputs` as keyword arguments,
+    and its result becomes available to later steps under `name`.
+    """
+
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    inputs: tuple[str, ...] = ()
+
+
+def _check_steps(steps: Sequence[Step], initial_names: set[str]) -> None:
+    known_names = set(initial_names)
+    for step in steps:
+        for input_name in step.inputs:
+            if input_name not in known_names:
+                raise ValueError(
+                    f"Step {step.name} depends on {input_name}, "
+                    "which is not an earlier step or an initial value."
+                )
+        if step.name in known_names:
+            raise ValueError(f"Duplicate step name: {step.name}")
+        known_names.add(step.name)
+
+
+async def run_pipeline(steps: Sequence[Step], **initial: Any) -> dict[str, Any]:
+    """Runs every step as soon as the steps it depends on have finished.
+
+    Steps must be listed after the steps they depend on. Calls made by a step
+    are labelled with its name in the metrics and the trace. Returns the initial
+    values together with the result of every step. If any step fails, the
+    others are cancelled and the error is raised.
+    """
+    _check_steps(steps, set(initial))
+
+    tasks: dict[str, asyncio.Task[Any]] = {}
+
+    async def run_step(step: Step) -> Any:
+        kwargs = {
+            input_name: (
+                initial[input_name]
+                if input_name in initial
+                else await tasks[input_name]
+            )
+            for input_name in step.inputs
+        }
+        with stage(step.name), trace_span(step.name, "stage"):
+            return await step.func(**kwargs)
+
+    for step in steps:
+        tasks[step.name] = asyncio.create_task(run_step(step))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    return initial | {name: task.result() for name, task in tasks.items()}
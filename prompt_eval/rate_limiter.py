@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+
+BACK_OFF_FACTOR = 0.5
+MIN_RATE_FRACTION = 1 / 64
+# 429s within this long of a rate cut are from requests sent before it.
+BACK_OFF_COOLDOWN_SEC = 5
+# The fraction of the configured request rate regained per minute.
+RATE_RECOVERY_PER_MINUTE = 0.1
+
+
+class TokenBucket:
+    """A bucket that refills continuously at `per_second` up to `capacity`.
+
+    Waiters are served in FIFO order so a large request cannot be starved by a
+    stream of small ones.
+    """
+
+    def __init__(self, *, capacity: float, per_second: float) -> None:
+        self._capacity = capacity
+        self._per_second = per_second
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(
+            self._capacity, self._level + (now - self._updated) * self._per_second
+        )
+        self._updated = now
+
+    async def take(self, amount: float) -> None:
+        amount = min(amount, self._capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                await asyncio.sleep((amount - self._level) / self._per_second)
+
+    def debit(self, amount: float) -> None:
+        """Takes `amount` without waiting. The level may go negative."""
+        self._refill()
+        self._level -= amount
+
+    def drain(self) -> None:
+        self._refill()
+        self._level = min(self._level, 0)
+
+    def set_rate(self, per_second: float) -> None:
+        self._refill()
+        self._per_second = per_second
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets for one model.
+
+    The request rate is cut on each quota error and recovers gradually, so a
+    configured budget above the real quota settles below it.
+    """
+
+    def __init__(self, *, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self._requests_per_minute = requests_per_minute
+        self._requests = TokenBucket(
+            capacity=requests_per_minute, per_second=requests_per_minute / 60
+        )
+        self._tokens = TokenBucket(
+            capacity=tokens_per_minute, per_second=tokens_per_minute / 60
+        )
+        self._rate_fraction = 1.0
+        self._rate_updated = time.monotonic()
+        self._last_back_off = -float("inf")
+
+    def _set_rate_fraction(self, rate_fraction: float) -> None:
+        self._rate_fraction = rate_fraction
+        self._requests.set_rate(self._requests_per_minute * rate_fraction / 60)
+
+    def _recover(self) -> None:
+        now = time.monotonic()
+        if self._rate_fraction < 1:
+            self._set_rate_fraction(
+                min(
+                    1.0,
+                    self._rate_fraction
+                    + (now - self._rate_updated) / 60 * RATE_RECOVERY_PER_MINUTE,
+                )
+            )
+        self._rate_updated = now
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        self._recover()
+        await self._requests.take(1)
+        await self._tokens.take(estimated_tokens)
+
+    def reconcile(self, *, estimated_tokens: int, actual_tokens: int) -> None:
+        """Corrects the token budget once the real usage is known."""
+        self._tokens.debit(actual_tokens - estimated_tokens)
+
+    def back_off(self) -> None:
+        """Cuts the request rate and empties the request budget.
+
+        Called when the server rejects a request for quota reasons, which means
+        our budget is more generous than the real one. Every caller waits for
+        the budget to refill at the lower rate.
+        """
+        self._recover()
+        now = time.monotonic()
+        if now - self._last_back_off >= BACK_OFF_COOLDOWN_SEC:
+            self._last_back_off = now
+            self._set_rate_fraction(
+                max(MIN_RATE_FRACTION, self._rate_fraction * BACK_OFF_FACTOR)
+            )
+        self._requests.drain()
+
+
+class RetryBudget:
+    """Caps retries across all calls in the process.
+
+    Each retry spends one token. Tokens refill at `per_second`, and each
+    successful call earns back `refund` more, up to `max_retries`.
+    """
+
+    def __init__(self, *, max_retries: float, refund: float, per_second: float) -> None:
+        self._max_retries = max_retries
+        self._refund = refund
+        self._per_second = per_second
+        self._level = max_retries
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(
+            self._max_retries, self._level + (now - self._updated) * self._per_second
+        )
+        self._updated = now
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self._level < 1:
+            return False
+        self._level -= 1
+        return True
+
+    async def spend(self) -> None:
+        """Spends one token, waiting for the budget to refill if it is empty."""
+        async with self._lock:
+            while not self.try_spend():
+                await asyncio.sleep((1 - self._level) / self._per_second)
+
+    def refund(self) -> None:
+        self._refill()
+        self._level = min(self._max_retries, self._level + self._refund)
+
+
+_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def configure_rate_limit(
+    model: str, *, requests_per_minute: int, tokens_per_minute: int
+) -> None:
+    _rate_limiters[model] = RateLimiter(
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
+
+
+def get_rate_limiter(model: str) -> RateLimiter | None:
+    return _rate_limiters.get(model)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """A rough token count, good enough to pace requests before sending them."""
+    return sum(len(text) for text in texts) // 4 + 1
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from typing import Any
+
+
+EVICT_EVERY_N_PUTS = 1000
+FLUSH_INTERVAL_SEC = 15
+
+
+class ResponseCache:
+    """A content-addressed cache of model responses in a local SQLite file.
+
+    With the filename ":memory:", the cache only lasts for the run.
+
+    Entries older than `max_age_sec` are dropped, and the least recently used
+    entries are dropped once the stored responses exceed `max_bytes`.
+
+    Writes are committed, and access times recorded, only on eviction and
+    `flush`, so lookups on the event loop never wait on the disk. Run
+    `flush_periodically` so that a crash loses at most `flush_interval_sec`
+    of responses.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        *,
+        max_bytes: int | None = None,
+        max_age_sec: float | None = None,
+        flush_interval_sec: float = FLUSH_INTERVAL_SEC,
+    ) -> None:
+        self._flush_interval_sec = flush_interval_sec
+        self._max_bytes = max_bytes
+        self._max_age_sec = max_age_sec
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._connection.commit()
+        self._puts_since_eviction = 0
+        self._accessed: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evict()
+
+    @staticmethod
+    def make_key(
+        *,
+        model: str,
+        system_instruction: str,
+        input: str,
+        generation_config: dict[str, Any],
+        draw: int = 0,
+    ) -> str:
+        """The key of a request. Draws other than 0 are independent samples."""
+        request = [model, system_instruction, input, generation_config]
+        # The first draw keeps the key it had before draws were added.
+        payload = json.dumps(request + [draw] if draw else request, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        row = self._connection.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (
+            self._max_age_sec is not None and row[1] < now - self._max_age_sec
+        ):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._accessed[key] = now
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (key, response, len(response.encode()), now, now),
+        )
+
+        self._puts_since_eviction += 1
+        if self._puts_since_eviction >= EVICT_EVERY_N_PUTS:
+            self.evict()
+
+    def _write_access_times(self) -> None:
+        self._connection.executemany(
+            "UPDATE responses SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def flush(self) -> None:
+        self._write_access_times()
+        self._connection.commit()
+
+    async def flush_periodically(self) -> None:
+        """Flushes every `flush_interval_sec` until cancelled."""
+        while True:
+            await asyncio.sleep(self._flush_interval_sec)
+            self.flush()
+
+    def evict(self) -> None:
+        self._puts_since_eviction = 0
+        self._write_access_times()
+        if self._max_age_sec is not None:
+            self._connection.execute(
+                "DELETE FROM responses WHERE created < ?",
+                (time.time() - self._max_age_sec,),
+            )
+        if self._max_bytes is not None:
+            (total_bytes,) = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            if total_bytes > self._max_bytes:
+                self._connection.execute(
+                    """DELETE FROM responses WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (
+                                ORDER BY accessed DESC, key
+                            ) AS kept_bytes
+                            FROM responses
+                        ) WHERE kept_bytes > ?
+                    )""",
+                    (self._max_bytes,),
+                )
+        self._connection.commit()
+
+    def log_stats(self) -> None:
+        logging.info(f"Response cache: {self.hits} hits, {self.misses} misses.")
+
+
+_response_cache: ResponseCache | None = None
+
+
+def configure_response_cache(
+    filename: str,
+    *,
+    max_bytes: int | None = None,
+    max_age_sec: float | None = None,
+) -> ResponseCache:
+    global _response_cache
+    _response_cache = ResponseCache(
+        filename, max_bytes=max_bytes, max_age_sec=max_age_sec
+    )
+    return _response_cache
+
+
+def get_response_cache() -> ResponseCache | None:
+    return _response_cache
@@ -1,10 +1,22 @@
 import asyncio
+import contextlib
 from io import TextIOWrapper
+import itertools
 import logging
-import math
-from typing import Iterable, Iterator
+import os
+from pydantic import BaseModel
+import time
+from typing import Iterable, Mapping
 from .dataset_loader import Sample
+from .early_stopping import EarlyStopping, SequentialMonitor, load_grades
 from .eval_list import EvalFunc
+from .gemini import start_request_counter
+from .metrics import get_metrics, set_eval_func
+from .tracing import trace_lane, trace_span
+
+
+# How long an interrupted run waits for the samples in flight to be written.
+DRAIN_TIMEOUT_SEC = 60
 
 
 async def _eval_and_log(
@@ -12,21 +24,74 @@ async def _eval_and_log(
     eval_func: EvalFunc,
     sample: Sample,
     output: TextIOWrapper,
-) -> None:
-    experiment = await eval_func(model, sample)
+) -> tuple[BaseModel, int]:
+    """Returns the experiment and the number of requests it took."""
+    request_counter = start_request_counter()
+    set_eval_func(eval_func.__name__)
+    start = time.perf_counter()
+    with trace_lane(), trace_span(eval_func.__name__, "sample", sample_id=sample.id):
+        experiment = await eval_func(model, sample)
+    metrics = get_metrics()
+    if metrics:
+        metrics.observe(
+            "prompt_eval_sample_latency_seconds",
+            time.perf_counter() - start,
+            eval_func=eval_func.__name__,
+        )
     output.write(experiment.model_dump_json())
     output.write("\n")
+    output.flush()
+    return experiment, request_counter.requests
+
+
+def _load_done_grades(output_filename: str) -> dict[str, int]:
+    """The grade of each question already in the output file.
+
+    A partial last line, left by a crash in the middle of a write, is cut off
+    so that appending starts on a fresh line.
+    """
+    if not os.path.exists(output_filename):
+        return {}
+
+    complete_bytes = 0
+    with open(output_filename, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete_bytes += len(line)
+    os.truncate(output_filename, complete_bytes)
+    return load_grades(output_filename)
 
 
-def _batch_samples(
-    samples: Iterable[Sample], batch_size: int
-) -> Iterator[list[Sample]]:
-    batch: list[Sample] = []
-    for sample in samples:
-        batch.append(sample)
-        if len(batch) == batch_size:
-            yield batch
-            batch = []
+class _EvalProgress:
+    def __init__(
+        self, eval_func: EvalFunc, monitor: SequentialMonitor | None = None
+    ) -> None:
+        self.name = eval_func.__name__
+        self.done = 0
+        self.bad = 0
+        self.monitor = monitor
+
+    def record(self, task: asyncio.Task[tuple[BaseModel, int]]) -> None:
+        self.done += 1
+        exception = task.exception()
+        if exception is not None:
+            logging.warning(f"Eval {self.name} failed: {exception!r}")
+            self.bad += 1
+            return
+
+        if self.monitor and not self.monitor.stopped:
+            experiment, requests = task.result()
+            self.monitor.record(
+                getattr(experiment, "question"), getattr(experiment, "grade"), requests
+            )
+            if self.monitor.stopped:
+                logging.info(f"Eval {self.name}: Stopping early: {self.monitor.reason}")
+
+    def log(self) -> None:
+        logging.info(
+            f"Eval {self.name}: Done {self.done} samples, with {self.bad} errors."
+        )
 
 
 async def run_eval(
@@ -35,26 +100,136 @@ async def run_eval(
     eval_func: EvalFunc,
     samples: Iterable[Sample],
     output_filename: str,
-    batch_size: int = 10,
+    concurrency: int = 10,
     limit: int | None = None,
+    resume: bool = False,
+    early_stopping: EarlyStopping | None = None,
 ) -> None:
-    actual_limit = limit or math.inf
-    done = 0
-    bad = 0
-    with open(output_filename, "w") as output:
-        for batch in _batch_samples(samples, batch_size=batch_size):
-            results = await asyncio.gather(
-                *[_eval_and_log(model, eval_func, sample, output) for sample in batch],
-                return_exceptions=True,
-            )
+    """Evaluates samples with at most `concurrency` of them in flight.
 
-            done += len(results)
-            bad += len(
-                [exception for exception in results if isinstance(exception, Exception)]
-            )
+    A new sample starts as soon as any in-flight sample finishes, so one slow
+    sample does not hold back the others.
+
+    With `resume`, samples whose question is already in the output file are
+    skipped and new results are appended to it.
+
+    With `early_stopping`, no new sample starts once the results are
+    conclusive. The samples should then be in a random order, e.g. from
+    `load_samples` with a `shuffle_seed`, so that the results seen so far are
+    representative.
+    """
+    await run_evals(
+        model=model,
+        outputs={eval_func: output_filename},
+        samples=samples,
+        concurrency=concurrency,
+        limit=limit,
+        resume=resume,
+        early_stopping=early_stopping,
+    )
+
+
+async def run_evals(
+    *,
+    model: str,
+    outputs: Mapping[EvalFunc, str],
+    samples: Iterable[Sample],
+    concurrency: int = 10,
+    limit: int | None = None,
+    resume: bool = False,
+    early_stopping: EarlyStopping | None = None,
+) -> None:
+    """Like `run_eval`, for several eval functions sharing one in-flight window.
+
+    `outputs` maps each eval function to its output file. Each sample is
+    started for every eval function before the next sample is started, though
+    the next sample does not wait for the earlier ones to finish. So all eval
+    functions progress together and finish at about the same time. With
+    `early_stopping`, each eval function stops on its own.
+    """
+    done_grades = {
+        eval_func: _load_done_grades(output_filename) if resume else {}
+        for eval_func, output_filename in outputs.items()
+    }
+    for eval_func, grades in done_grades.items():
+        if grades:
             logging.info(
-                f"Eval {eval_func.__name__}: Done {done} samples, with {bad} errors."
+                f"Eval {eval_func.__name__}: Resuming after {len(grades)} samples."
             )
 
-            if done >= actual_limit:
-                break
+    progress = {}
+    for eval_func in outputs:
+        monitor = SequentialMonitor(early_stopping) if early_stopping else None
+        if monitor:
+            for question, grade in done_grades[eval_func].items():
+                monitor.record(question, grade)
+        progress[eval_func] = _EvalProgress(eval_func, monitor)
+    in_flight: dict[asyncio.Task[tuple[BaseModel, int]], _EvalProgress] = {}
+    metrics = get_metrics()
+
+    async def wait_for_any() -> None:
+        finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            eval_progress = in_flight.pop(task)
+            eval_progress.record(task)
+            eval_progress.log()
+            if metrics:
+                metrics.inc(
+                    "prompt_eval_samples_total",
+                    eval_func=eval_progress.name,
+                    outcome="error" if task.exception() else "ok",
+                )
+        if metrics:
+            metrics.set("prompt_eval_samples_in_flight", len(in_flight))
+
+    with contextlib.ExitStack() as stack:
+        output_files = {
+            eval_func: stack.enter_context(
+                open(output_filename, "a" if resume else "w")
+            )
+            for eval_func, output_filename in outputs.items()
+        }
+        sample_count = 0
+        try:
+            for sample in itertools.islice(samples, limit):
+                sample_count += 1
+                for eval_func, output in output_files.items():
+                    if sample.question in done_grades[eval_func]:
+                        continue
+                    monitor = progress[eval_func].monitor
+                    if monitor and monitor.stopped:
+                        continue
+                    if len(in_flight) >= concurrency:
+                        await wait_for_any()
+                    task = asyncio.create_task(
+                        _eval_and_log(model, eval_func, sample, output)
+                    )
+                    in_flight[task] = progress[eval_func]
+                    if metrics:
+                        metrics.set("prompt_eval_samples_in_flight", len(in_flight))
+            while in_flight:
+                await wait_for_any()
+        finally:
+            # Samples in flight are already paid for, so they are given a
+            # chance to finish and be written before the files close.
+            try:
+                if in_flight:
+                    logging.info(f"Waiting for {len(in_flight)} samples in flight.")
+                    await asyncio.wait(in_flight, timeout=DRAIN_TIMEOUT_SEC)
+            finally:
+                for task in in_flight:
+                    task.cancel()
+                if in_flight:
+                    await asyncio.wait(in_flight)
+
+    if early_stopping:
+        for eval_func, eval_progress in progress.items():
+            monitor = eval_progress.monitor
+            if monitor and monitor.stopped:
+                skipped = (
+                    sample_count - len(done_grades[eval_func]) - eval_progress.done
+                )
+                logging.info(
+                    f"Eval {eval_progress.name}: Skipped {skipped} samples, "
+                    f"saving about {monitor.requests_saved(skipped)} requests."
+                )
@@ -0,0 +1,119 @@
+"""An opt-in timeline of a run, in the Chrome trace event format.
+
+Open the written file in https://ui.perfetto.dev or chrome://tracing. Each
+row is one of the runner's in-flight slots, so gaps between samples on a row
+are idle concurrency.
+"""
+
+import contextlib
+from contextvars import ContextVar
+import heapq
+import json
+import time
+from typing import Any, Iterator
+
+
+_lane: ContextVar[int] = ContextVar("trace_lane", default=0)
+
+
+class Tracer:
+    """Collects spans in memory and writes them as trace events."""
+
+    def __init__(self, filename: str) -> None:
+        self._filename = filename
+        self._start = time.perf_counter()
+        self._events: list[dict[str, Any]] = []
+        self._free_lanes: list[int] = []
+        self._lanes = 0
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._start) * 1e6
+
+    @contextlib.contextmanager
+    def lane(self) -> Iterator[None]:
+        """Puts the spans recorded inside the block on the lowest free row.
+
+        Tasks started inside the block share the row.
+        """
+        if self._free_lanes:
+            lane = heapq.heappop(self._free_lanes)
+        else:
+            self._lanes += 1
+            lane = self._lanes
+            self._events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": lane,
+                    "args": {"name": f"slot {lane}"},
+                }
+            )
+        token = _lane.set(lane)
+        try:
+            yield
+        finally:
+            _lane.reset(token)
+            heapq.heappush(self._free_lanes, lane)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[dict[str, Any]]:
+        """Records the time spent in the block.
+
+        Yields the span's args, which the block may add to.
+        """
+        start = self._now_us()
+        try:
+            yield args
+        finally:
+            self._events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start,
+                    "dur": self._now_us() - start,
+                    "pid": 1,
+                    "tid": _lane.get(),
+                    "args": args,
+                }
+            )
+
+    def write(self) -> None:
+        with open(self._filename, "w") as f:
+            json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, f)
+
+
+_tracer: Tracer | None = None
+
+
+def configure_tracer(filename: str) -> Tracer:
+    global _tracer
+    _tracer = Tracer(filename)
+    return _tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+@contextlib.contextmanager
+def trace_lane() -> Iterator[None]:
+    """`Tracer.lane` on the configured tracer, if tracing is on."""
+    tracer = get_tracer()
+    if not tracer:
+        yield
+        return
+    with tracer.lane():
+        yield
+
+
+@contextlib.contextmanager
+def trace_span(name: str, category: str, **args: Any) -> Iterator[dict[str, Any]]:
+    """`Tracer.span` on the configured tracer, if tracing is on."""
+    tracer = get_tracer()
+    if not tracer:
+        yield args
+        return
+    with tracer.span(name, category, **args) as span_args:
+        yield span_args
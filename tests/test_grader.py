@@ -0,0 +1,91 @@
+import pytest
+from prompt_eval.eval_n_prompts_reflection import _classify_critique
+from prompt_eval.grader import _grade_locally, _parse_verdicts
+
+
+@pytest.mark.parametrize(
+    "human_short_answer, model_short_answer, grade",
+    [
+        ("42", "42", 1),
+        ("1,000", "1000.", 1),
+        ("$18", "18", 1),
+        ("5", "5 apples", 1),
+        ("3 boxes", "3 boxes", 1),
+        ("5", "6", 0),
+        ("$5", "$6", 0),
+        ("50%", "40%", 0),
+        ("5", "6 apples", 0),
+        ("3 boxes", "4 boxes", 0),
+        # The same number with a unit that changes its meaning.
+        ("3", "3 dozen", None),
+        ("5", "5 or more", None),
+        ("2 hours", "2 minutes", None),
+        # A different number that may be the same quantity in another unit.
+        ("60", "1 hour", None),
+        ("12", "1 year", None),
+        ("24", "2 feet", None),
+        ("2000", "2 kg", None),
+        ("50", "50 cents", None),
+        ("50%", "0.5", None),
+        ("4:00 PM", "16:00", None),
+    ],
+)
+def test_grade_locally(
+    human_short_answer: str, model_short_answer: str, grade: int | None
+) -> None:
+    assert (
+        _grade_locally(
+            human_short_answer=human_short_answer,
+            model_short_answer=model_short_answer,
+        )
+        == grade
+    )
+
+
+@pytest.mark.parametrize(
+    "response, count, grades",
+    [
+        ("1: 1\n2: 0\n3: 1", 3, [1, 0, 1]),
+        ("Item 1: 0\nitem 2. 1", 2, [0, 1]),
+        ("2) 1\n1) 0", 2, [0, 1]),
+        ("1: 1\n1: 1\n2: 0", 2, [1, 0]),
+        # A missing, extra or contradictory verdict fails the whole batch.
+        ("1: 1", 2, None),
+        ("1: 1\n2: 0\n3: 1", 2, None),
+        ("1: 1\n1: 0\n2: 0", 2, None),
+        ("1: yes\n2: 0", 2, None),
+        ("", 1, None),
+    ],
+)
+def test_parse_verdicts(response: str, count: int, grades: list[int] | None) -> None:
+    assert _parse_verdicts(response, count) == grades
+
+
+@pytest.mark.parametrize(
+    "reflection, found_error",
+    [
+        ("The answer is correct.", False),
+        ("All steps are correct and the final answer is correct.", False),
+        ("Step 2 is wrong: 5 * 3 is 15, not 12.", True),
+        ("There is a miscalculation in step 3.", True),
+        (
+            "There are no errors in the computation of the total, but the "
+            "question asked for the difference.",
+            True,
+        ),
+        # A verdict on one step, or one with a caveat, is left to the LLM.
+        (
+            "Step 1 is correct. Step 2 is correct. Step 3 adds 5 instead of "
+            "subtracting 5.",
+            None,
+        ),
+        (
+            "The reasoning is correct but the final answer 12 is not the right " "one.",
+            None,
+        ),
+        ("All steps are correct except step 3.", None),
+        ("The answer is correct, although there is an error in step 2.", None),
+    ],
+)
+def test_classify_critique(reflection: str, found_error: bool | None) -> None:
+    assert _classify_critique(reflection) == found_error